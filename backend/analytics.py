@@ -0,0 +1,155 @@
+import os
+import asyncio
+from datetime import datetime, timedelta, timezone
+from pymongo import UpdateOne, ASCENDING
+
+# Pre-aggregated detection counts for the dashboard charts.
+#
+# Every scan (a processed upload or a live frame) adds to one hour bucket and
+# one day bucket per (user, camera):
+#   scans            scans in the bucket
+#   threat_scans     scans that saw a poacher or weapon
+#   poacher_scans    scans that saw a poacher
+#   weapon_scans     scans that saw a weapon (weapon or ww)
+#   live_empty_scans live frames with no detections; these are never stored as
+#                    detections, so this count is what rebuild_analytics.py
+#                    carries over for them
+#   classes.<name>   scans that saw that class
+#   boxes.<name>     boxes of that class
+# Increments are buffered in memory and flushed as one bulk $inc every
+# ANALYTICS_FLUSH_INTERVAL seconds, so a busy live feed costs one write per
+# bucket per interval rather than one per frame. /analytics reads only these
+# documents; rebuild_analytics.py recomputes them from the stored results and
+# detections.
+
+ANALYTICS_FLUSH_INTERVAL = float(os.getenv("ANALYTICS_FLUSH_INTERVAL", "5"))
+GRANULARITIES = {"hour": timedelta(hours=1), "day": timedelta(days=1)}
+CLASS_NAMES = {0: "poacher", 1: "ranger", 2: "weapon", 3: "ww"}
+THREAT_CLASSES = (0, 2, 3)
+POACHER_CLASSES = (0,)
+WEAPON_CLASSES = (2, 3)
+SCAN_FIELDS = ("scans", "threat_scans", "poacher_scans", "weapon_scans", "live_empty_scans")
+
+def bucket_start(timestamp, granularity):
+    # Naive datetimes (as read back from MongoDB) are UTC
+    timestamp = timestamp.replace(tzinfo=timezone.utc) if timestamp.tzinfo is None else timestamp.astimezone(timezone.utc)
+    if granularity == "hour":
+        return timestamp.replace(minute=0, second=0, microsecond=0)
+    return timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
+
+def scan_counts(detections, live=False):
+    # detections: iterable of dicts with class_id -> the $inc fields for one scan
+    counts = {"scans": 1}
+    seen = set()
+    for det in detections:
+        name = CLASS_NAMES.get(det["class_id"], str(det["class_id"]))
+        counts[f"boxes.{name}"] = counts.get(f"boxes.{name}", 0) + 1
+        seen.add(det["class_id"])
+    for class_id in seen:
+        counts[f"classes.{CLASS_NAMES.get(class_id, str(class_id))}"] = 1
+    if seen & set(THREAT_CLASSES):
+        counts["threat_scans"] = 1
+    if seen & set(POACHER_CLASSES):
+        counts["poacher_scans"] = 1
+    if seen & set(WEAPON_CLASSES):
+        counts["weapon_scans"] = 1
+    if live and not seen:
+        counts["live_empty_scans"] = 1
+    return counts
+
+def result_detections(result):
+    # The boxes a finished job counts with: still detections, video tracks, or
+    # (untracked videos) one stand-in per class flagged in the summary
+    if result.get("detections"):
+        return result["detections"]
+    if result.get("tracks"):
+        return result["tracks"]
+    flagged = []
+    if result.get("poacher_detected"):
+        flagged.append({"class_id": 0})
+    if result.get("weapon_detected") in (True, "Yes"):
+        flagged.append({"class_id": 2})
+    return flagged
+
+class RollupBuffer:
+    # Only touched from the event loop, so no lock
+    def __init__(self):
+        self._pending = {} # (granularity, user, camera_id, bucket) -> {field: increment}
+
+    def record(self, user, camera_id, timestamp, detections, live=False):
+        counts = scan_counts(detections, live)
+        for granularity in GRANULARITIES:
+            self.add(granularity, user, camera_id, bucket_start(timestamp, granularity), counts)
+
+    def add(self, granularity, user, camera_id, bucket, counts):
+        pending = self._pending.setdefault((granularity, user, camera_id, bucket), {})
+        for field, value in counts.items():
+            pending[field] = pending.get(field, 0) + value
+
+    def drain(self):
+        pending, self._pending = self._pending, {}
+        return pending
+
+    async def flush(self, db):
+        pending = self.drain()
+        await write_increments(db, pending)
+        return len(pending)
+
+async def write_increments(db, pending):
+    operations = []
+    for (granularity, user, camera_id, bucket), counts in pending.items():
+        operations.append(UpdateOne(
+            {"granularity": granularity, "user": user, "camera_id": camera_id, "bucket": bucket},
+            {"$inc": counts},
+            upsert=True,
+        ))
+    if operations:
+        await db.analytics_rollups.bulk_write(operations, ordered=False)
+
+async def ensure_indexes(db):
+    await db.analytics_rollups.create_index(
+        [("user", ASCENDING), ("granularity", ASCENDING), ("bucket", ASCENDING), ("camera_id", ASCENDING)], unique=True)
+
+rollups = RollupBuffer()
+
+async def run_flusher(db):
+    # Background task for the API's lifetime
+    while True:
+        await asyncio.sleep(ANALYTICS_FLUSH_INTERVAL)
+        try:
+            await rollups.flush(db)
+        except Exception as e:
+            print(f"Warning: Analytics flush failed: {e}", flush=True)
+
+async def query_rollups(db, user, granularity="hour", since=None, until=None, camera_id=None):
+    # Buckets in [since, until), summed over cameras unless one is given
+    until = until or datetime.now(timezone.utc)
+    since = since or until - (timedelta(hours=24) if granularity == "hour" else timedelta(days=30))
+    query = {"user": user, "granularity": granularity, "bucket": {"$gte": bucket_start(since, granularity), "$lt": until}}
+    if camera_id:
+        query["camera_id"] = camera_id
+
+    buckets = {}
+    async for doc in db.analytics_rollups.find(query):
+        bucket = buckets.setdefault(doc["bucket"], dict({field: 0 for field in SCAN_FIELDS}, classes={}, boxes={}))
+        for field in SCAN_FIELDS:
+            bucket[field] += doc.get(field, 0)
+        for group in ("classes", "boxes"):
+            for name, value in doc.get(group, {}).items():
+                bucket[group][name] = bucket[group].get(name, 0) + value
+
+    totals = dict({field: 0 for field in SCAN_FIELDS}, classes={}, boxes={})
+    for bucket in buckets.values():
+        for field in SCAN_FIELDS:
+            totals[field] += bucket[field]
+        for group in ("classes", "boxes"):
+            for name, value in bucket[group].items():
+                totals[group][name] = totals[group].get(name, 0) + value
+
+    return {
+        "granularity": granularity,
+        "since": since.isoformat(),
+        "until": until.isoformat(),
+        "buckets": [dict(counts, bucket=start.replace(tzinfo=timezone.utc).isoformat()) for start, counts in sorted(buckets.items())],
+        "totals": totals,
+    }
@@ -1,56 +1,231 @@
-from ultralytics import YOLO
 import os
+import sys
+import json
+import time
+import hashlib
+import argparse
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 import cv2
+import numpy as np
+from backends import INFERENCE_BACKEND, load_backend
+from video_pipeline import run_pipeline
 
-def auto_label_images(source_dir, output_dir):
-    # Load the model (using the medium model for better accuracy)
-    model = YOLO('yolov8m.pt')
-    
+# Auto-labeling for large image folders (e.g. camera-trap frames).
+#
+# Files are read, hashed and decoded on a thread pool, inferred in batches, and
+# their YOLO label files written on a third thread (video_pipeline stages).
+# Every labeled image is appended to a manifest in the output folder, keyed by
+# content hash + model id, so a re-run (or a run resumed after Ctrl+C / a
+# crash) skips everything already done. Unchanged files are matched on
+# name/size/mtime without being re-read; renamed or duplicated images are
+# matched on their hash and get their labels from the manifest.
+#
+#   python auto_label.py --source raw_images --output auto_labels [--batch-size 16] [--workers 4]
+
+LABEL_MODEL = os.getenv("LABEL_MODEL", "yolov8m.pt") # Medium model for better accuracy
+LABEL_CONF = float(os.getenv("LABEL_CONF", "0.25"))
+LABEL_BATCH_SIZE = int(os.getenv("LABEL_BATCH_SIZE", "16"))
+LABEL_WORKERS = int(os.getenv("LABEL_WORKERS", "4")) # Read/hash/decode threads
+MANIFEST_NAME = ".auto_label_manifest.jsonl"
+VALID_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.webp')
+REPORT_INTERVAL = 5.0 # Seconds between progress lines
+
+def model_id(weights_path, conf):
+    # Labels are only reused for the same weights and settings
+    try:
+        stat = os.stat(weights_path)
+        ident = f"{os.path.basename(weights_path)}:{stat.st_size}:{int(stat.st_mtime)}"
+    except OSError:
+        ident = os.path.basename(weights_path)
+    ident += f"|{INFERENCE_BACKEND}|{conf}"
+    return hashlib.sha256(ident.encode()).hexdigest()[:12]
+
+class Manifest:
+    def __init__(self, path, model):
+        self.path = path
+        self.model = model
+        self.by_file = {} # filename -> entry, for this model
+        self.by_hash = {} # sha256 -> entry, for this model
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue # Torn last line from an interrupted run
+                    if entry.get("model") == model:
+                        self.by_file[entry["file"]] = entry
+                        self.by_hash[entry["sha256"]] = entry
+        self._out = open(path, "a", encoding="utf-8")
+
+    def unchanged(self, filename, stat):
+        entry = self.by_file.get(filename)
+        return entry is not None and entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns
+
+    def add(self, entry):
+        entry["model"] = self.model
+        self.by_file[entry["file"]] = entry
+        self.by_hash[entry["sha256"]] = entry
+        self._out.write(json.dumps(entry) + "\n")
+
+    def flush(self):
+        # Once per batch: an interrupted run loses at most one batch of work
+        self._out.flush()
+        os.fsync(self._out.fileno())
+
+    def close(self):
+        self._out.close()
+
+def label_lines(result):
+    # YOLO format: <class> <x_center> <y_center> <width> <height>, normalized 0-1
+    lines = []
+    for box in result.boxes:
+        x, y, w, h = box.xywhn[0]
+        lines.append(f"{int(box.cls[0])} {x:.6f} {y:.6f} {w:.6f} {h:.6f}")
+    return lines
+
+def write_label(output_dir, filename, lines):
+    label_path = os.path.join(output_dir, os.path.splitext(filename)[0] + ".txt")
+    tmp_path = label_path + ".tmp"
+    with open(tmp_path, "w") as f:
+        f.write("".join(line + "\n" for line in lines))
+    os.replace(tmp_path, label_path) # A label file is either whole or absent
+
+class Progress:
+    def __init__(self, total):
+        self.total = total
+        self.labeled = self.skipped = self.failed = 0
+        self.started = self.last_report = time.perf_counter()
+
+    @property
+    def done(self):
+        return self.labeled + self.skipped + self.failed
+
+    def report(self, force=False):
+        now = time.perf_counter()
+        if not force and now - self.last_report < REPORT_INTERVAL:
+            return
+        self.last_report = now
+        elapsed = now - self.started
+        rate = self.labeled / elapsed if elapsed > 0 else 0.0
+        # Skips are nearly free, so the ETA assumes the rest all need the model
+        remaining = self.total - self.done
+        eta = f"{remaining / rate / 60:.1f} min" if rate > 0 else "?"
+        print(f"{self.done}/{self.total}  labeled {self.labeled}, skipped {self.skipped}, failed {self.failed}  "
+              f"{rate:.1f} img/s  ETA {eta}", flush=True)
+
+def read_image(source_dir, filename, manifest):
+    # Runs on the decode pool: returns an item dict for the pipeline
+    path = os.path.join(source_dir, filename)
+    try:
+        stat = os.stat(path)
+        if manifest.unchanged(filename, stat):
+            return {"file": filename, "status": "skipped"}
+        with open(path, "rb") as f:
+            data = f.read()
+    except OSError as e:
+        return {"file": filename, "status": "failed", "error": str(e)}
+    item = {"file": filename, "sha256": hashlib.sha256(data).hexdigest(), "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+    known = manifest.by_hash.get(item["sha256"])
+    if known:
+        # Same bytes under another name (or touched): reuse the labels
+        item.update(status="copied", lines=known["lines"])
+        return item
+    image = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+    if image is None:
+        return {"file": filename, "status": "failed", "error": "not a readable image"}
+    item.update(status="infer", image=image)
+    return item
+
+def auto_label_images(source_dir, output_dir, batch_size=LABEL_BATCH_SIZE, workers=LABEL_WORKERS,
+                      weights=LABEL_MODEL, conf=LABEL_CONF):
+    model = load_backend(INFERENCE_BACKEND, weights)
     os.makedirs(output_dir, exist_ok=True)
-    
-    # Supported image extensions
-    valid_extensions = ('.jpg', '.jpeg', '.png', '.bmp', '.webp')
-    
-    files = [f for f in os.listdir(source_dir) if f.lower().endswith(valid_extensions)]
-    print(f"Found {len(files)} images to label...")
-    
-    for filename in files:
-        file_path = os.path.join(source_dir, filename)
-        
-        # Run detection
-        results = model(file_path, conf=0.25) # Confidence threshold
-        
-        # Prepare label file path
-        label_filename = os.path.splitext(filename)[0] + ".txt"
-        label_path = os.path.join(output_dir, label_filename)
-        
-        with open(label_path, "w") as f:
-            for result in results:
-                for box in result.boxes:
-                    # Get class ID
-                    cls = int(box.cls[0])
-                    
-                    # Only label classes we care about if needed, or label all
-                    # YOLO format: <class> <x_center> <y_center> <width> <height>
-                    # Coordinates are normalized (0-1)
-                    
-                    x, y, w, h = box.xywhn[0]
-                    
-                    f.write(f"{cls} {x:.6f} {y:.6f} {w:.6f} {h:.6f}\n")
-        
-        print(f"Labeled: {filename}")
+
+    manifest = Manifest(os.path.join(output_dir, MANIFEST_NAME), model_id(model.path, conf))
+    files = sorted(f for f in os.listdir(source_dir) if f.lower().endswith(VALID_EXTENSIONS))
+    print(f"Found {len(files)} images, {len(manifest.by_file)} already in the manifest for this model", flush=True)
+    progress = Progress(len(files))
+    pool = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="label-decode")
+
+    def produce():
+        # Keep a bounded number of reads in flight; results come back in file order
+        # A batch closes at batch_size images to infer, or sooner on a mostly-skipped stretch
+        in_flight = deque()
+        batch = []
+        to_infer = 0
+        names = iter(files)
+        while True:
+            while len(in_flight) < batch_size * 2:
+                filename = next(names, None)
+                if filename is None:
+                    break
+                in_flight.append(pool.submit(read_image, source_dir, filename, manifest))
+            if not in_flight:
+                break
+            item = in_flight.popleft().result()
+            batch.append(item)
+            to_infer += item["status"] == "infer"
+            if to_infer >= batch_size or len(batch) >= batch_size * 8:
+                yield batch
+                batch = []
+                to_infer = 0
+        if batch:
+            yield batch
+
+    def infer(batch):
+        to_infer = [item for item in batch if item["status"] == "infer"]
+        if to_infer:
+            results = model([item["image"] for item in to_infer], conf=conf)
+            for item, result in zip(to_infer, results):
+                item["lines"] = label_lines(result)
+                del item["image"]
+        return batch
+
+    def write(batch):
+        for item in batch:
+            status = item["status"]
+            if status in ("infer", "copied"):
+                write_label(output_dir, item["file"], item["lines"])
+                manifest.add({key: item[key] for key in ("file", "sha256", "size", "mtime_ns", "lines")})
+                if status == "infer":
+                    progress.labeled += 1
+                else:
+                    progress.skipped += 1
+            elif status == "skipped":
+                progress.skipped += 1
+            else:
+                progress.failed += 1
+                print(f"Failed: {item['file']}: {item['error']}", flush=True)
+        manifest.flush()
+        progress.report()
+
+    try:
+        timings = run_pipeline(produce, infer, write)
+    except KeyboardInterrupt:
+        print(f"\nInterrupted after {progress.done}/{progress.total} images; run again to resume.", flush=True)
+        return progress
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+        manifest.close()
+
+    progress.report(force=True)
+    print(f"Stage timings (s): {timings}", flush=True)
+    return progress
 
 if __name__ == "__main__":
-    # INSTRUCTIONS:
-    # 1. Put your raw images in a folder (e.g., 'raw_images')
-    # 2. Update the paths below
-    # 3. Run this script
-    
-    source_images = "raw_images" # Change this to your image folder
-    output_labels = "auto_labels" # Where to save the .txt files
-    
-    if not os.path.exists(source_images):
-        print(f"Error: Source directory '{source_images}' not found.")
+    parser = argparse.ArgumentParser(description="Write YOLO label files for a folder of images, resuming where the last run stopped")
+    parser.add_argument("--source", default="raw_images", help="Folder of raw images")
+    parser.add_argument("--output", default="auto_labels", help="Where to write the .txt label files and the manifest")
+    parser.add_argument("--weights", default=LABEL_MODEL)
+    parser.add_argument("--conf", type=float, default=LABEL_CONF)
+    parser.add_argument("--batch-size", type=int, default=LABEL_BATCH_SIZE)
+    parser.add_argument("--workers", type=int, default=LABEL_WORKERS)
+    args = parser.parse_args()
+
+    if not os.path.exists(args.source):
+        print(f"Error: Source directory '{args.source}' not found.")
         print("Please create a folder named 'raw_images' and put your images there.")
-    else:
-        auto_label_images(source_images, output_labels)
+        sys.exit(1)
+    auto_label_images(args.source, args.output, args.batch_size, args.workers, args.weights, args.conf)
@@ -0,0 +1,84 @@
+import os
+
+# Pluggable inference backends.
+#
+# Every backend is called like the YOLO object (backend(frames, conf=...)) and
+# exposes .names, and every backend returns ultralytics Results, so
+# process_video / process_frame read boxes.xyxy / boxes.cls / boxes.conf and
+# call plot() the same way whichever runtime does the math. Exported models
+# are expected next to the .pt weights (see export_model.py).
+
+INFERENCE_BACKEND = os.getenv("INFERENCE_BACKEND", "torch")
+# Inference image size; unset means whatever the weights default to
+INFERENCE_IMGSZ = int(os.getenv("INFERENCE_IMGSZ")) if os.getenv("INFERENCE_IMGSZ") else None
+# Serve the INT8-quantized export (onnx / openvino backends only)
+INFERENCE_INT8 = os.getenv("INFERENCE_INT8", "0") == "1"
+
+def exported_path(weights_path, fmt, int8=False):
+    # Where export_model.py writes each format for a given .pt file
+    base = os.path.splitext(weights_path)[0]
+    if fmt == "onnx":
+        return base + (".int8.onnx" if int8 else ".onnx")
+    if fmt == "openvino":
+        return base + ("_int8_openvino_model" if int8 else "_openvino_model")
+    return weights_path
+
+class TorchBackend:
+    name = "torch"
+    format = "pt"
+
+    def __init__(self, weights_path, imgsz=None, int8=False):
+        from ultralytics import YOLO
+        self.imgsz = imgsz
+        self.int8 = int8
+        self.path = self.resolve(weights_path)
+        self.model = YOLO(self.path, task="detect")
+
+    def resolve(self, weights_path):
+        if self.int8:
+            raise ValueError("INT8 inference needs the onnx or openvino backend")
+        return weights_path
+
+    @property
+    def names(self):
+        return self.model.names
+
+    def __call__(self, source, **kwargs):
+        if self.imgsz:
+            kwargs.setdefault("imgsz", self.imgsz)
+        return self.model(source, **kwargs)
+
+class OnnxBackend(TorchBackend):
+    # ONNX Runtime on CPU, driven through ultralytics so pre/post-processing
+    # (letterbox, NMS, box scaling) is identical to the PyTorch path
+    name = "onnx"
+    format = "onnx"
+
+    def resolve(self, weights_path):
+        path = exported_path(weights_path, self.format, self.int8)
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"No ONNX export at {path}. Run: python export_model.py --format onnx{' --int8' if self.int8 else ''}")
+        return path
+
+class OpenVinoBackend(OnnxBackend):
+    name = "openvino"
+    format = "openvino"
+
+    def resolve(self, weights_path):
+        path = exported_path(weights_path, self.format, self.int8)
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"No OpenVINO export at {path}. Run: python export_model.py --format openvino{' --int8' if self.int8 else ''}")
+        return path
+
+BACKENDS = {
+    "torch": TorchBackend,
+    "onnx": OnnxBackend,
+    "openvino": OpenVinoBackend,
+}
+
+def load_backend(name, weights_path, imgsz=None, int8=False):
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown INFERENCE_BACKEND '{name}'. Choose one of: {', '.join(BACKENDS)}")
+    backend = BACKENDS[name](weights_path, imgsz=imgsz, int8=int8)
+    print(f"Using {backend.name} backend: {backend.path} (imgsz={imgsz or 'default'}, int8={int8})", flush=True)
+    return backend
@@ -0,0 +1,84 @@
+import os
+import time
+import queue
+import threading
+import collections
+from concurrent.futures import Future
+
+# Cross-client micro-batching for live frames.
+#
+# Callers on any thread submit single frames; one scheduler thread collects
+# them until LIVE_BATCH_SIZE frames are waiting or the oldest has waited
+# LIVE_BATCH_WAIT_MS, runs a single batched model call and hands each caller
+# its own result. The scheduler is the only thread that touches the model.
+
+LIVE_BATCH_SIZE = int(os.getenv("LIVE_BATCH_SIZE", "8"))
+LIVE_BATCH_WAIT_MS = float(os.getenv("LIVE_BATCH_WAIT_MS", "5"))
+
+class FrameBatcher:
+    def __init__(self, infer_batch, max_size=LIVE_BATCH_SIZE, max_wait_ms=LIVE_BATCH_WAIT_MS):
+        self.infer_batch = infer_batch # list of frames -> list of results, same order
+        self.max_size = max(1, max_size)
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._batches = 0
+        self._frames = 0
+        self._infer_seconds = 0.0
+        self._queue_delays = collections.deque(maxlen=1000) # Recent per-frame waits, seconds
+        self._thread = threading.Thread(target=self._run, name="live-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, frame):
+        future = Future()
+        self._queue.put((frame, future, time.monotonic()))
+        return future
+
+    def infer(self, frame):
+        # Blocking helper for worker threads: one frame in, its result out
+        return self.submit(frame).result()
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = batch[0][2] + self.max_wait
+        while len(batch) < self.max_size:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            started = time.monotonic()
+            try:
+                results = self.infer_batch([frame for frame, _, _ in batch])
+                for (_, future, _), result in zip(batch, results):
+                    future.set_result(result)
+            except Exception as e:
+                for _, future, _ in batch:
+                    future.set_exception(e)
+
+            with self._lock:
+                self._batches += 1
+                self._frames += len(batch)
+                self._infer_seconds += time.monotonic() - started
+                self._queue_delays.extend(started - enqueued for _, _, enqueued in batch)
+
+    def metrics(self):
+        with self._lock:
+            delays = sorted(self._queue_delays)
+            return {
+                "max_batch_size": self.max_size,
+                "max_wait_ms": self.max_wait * 1000,
+                "batches": self._batches,
+                "frames": self._frames,
+                "avg_batch_size": round(self._frames / self._batches, 2) if self._batches else None,
+                "fill_rate": round(self._frames / (self._batches * self.max_size), 3) if self._batches else None,
+                "avg_infer_ms": round(self._infer_seconds / self._batches * 1000, 1) if self._batches else None,
+                "queue_delay_ms": round(sum(delays) / len(delays) * 1000, 2) if delays else None,
+                "queue_delay_p95_ms": round(delays[int(len(delays) * 0.95)] * 1000, 2) if delays else None,
+                "pending": self._queue.qsize(),
+            }
@@ -0,0 +1,103 @@
+import os
+import sys
+import time
+import cv2
+import numpy as np
+from backends import BACKENDS, load_backend
+from detector import find_model_path
+
+# Usage: python benchmark_backends.py [image_or_video ...]
+# Runs every available backend on the same frames and
+#  - checks parity against the PyTorch model (same classes, boxes, confidences)
+#  - reports latency in ms/frame
+# Defaults to the images in ../uploads. Exits non-zero if a backend disagrees.
+
+CONF = 0.25
+IOU_MATCH = 0.9 # Boxes must overlap this much to count as the same detection
+CONF_TOLERANCE = 0.05 # Allowed confidence drift between runtimes
+BORDERLINE = 0.05 # Unmatched detections this close to CONF are numeric noise, not mismatches
+MAX_VIDEO_FRAMES = 64
+
+def load_frames(paths):
+    frames = []
+    for path in paths:
+        if path.lower().endswith(('.png', '.jpg', '.jpeg', '.bmp', '.webp')):
+            frame = cv2.imread(path)
+            if frame is not None:
+                frames.append(frame)
+        else:
+            cap = cv2.VideoCapture(path)
+            count = 0
+            while cap.isOpened() and count < MAX_VIDEO_FRAMES:
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                frames.append(frame)
+                count += 1
+            cap.release()
+    return frames
+
+def detections(result):
+    return [(int(b.cls[0]), float(b.conf[0]), b.xyxy[0].tolist()) for b in result.boxes]
+
+def iou(a, b):
+    x1, y1 = max(a[0], b[0]), max(a[1], b[1])
+    x2, y2 = min(a[2], b[2]), min(a[3], b[3])
+    inter = max(0.0, x2 - x1) * max(0.0, y2 - y1)
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+def frames_match(reference, candidate):
+    unmatched = list(candidate)
+    for cls, conf, box in reference:
+        match = next((d for d in unmatched if d[0] == cls and iou(d[2], box) >= IOU_MATCH and abs(d[1] - conf) <= CONF_TOLERANCE), None)
+        if match:
+            unmatched.remove(match)
+        elif conf > CONF + BORDERLINE:
+            return False
+    return all(conf <= CONF + BORDERLINE for _, conf, _ in unmatched)
+
+def run(backend, frames):
+    backend(frames[0], conf=CONF, verbose=False) # warmup
+    timings = []
+    outputs = []
+    for frame in frames:
+        start = time.perf_counter()
+        results = backend(frame, conf=CONF, verbose=False)
+        timings.append((time.perf_counter() - start) * 1000)
+        outputs.append(detections(results[0]))
+    return outputs, timings
+
+if __name__ == "__main__":
+    paths = sys.argv[1:]
+    if not paths:
+        upload_dir = os.path.join(os.path.dirname(__file__), "..", "uploads")
+        paths = [os.path.join(upload_dir, f) for f in sorted(os.listdir(upload_dir))
+                 if not f.startswith("processed_") and f.lower().endswith(('.png', '.jpg', '.jpeg'))]
+
+    frames = load_frames(paths)
+    if not frames:
+        print("Error: no frames to benchmark")
+        sys.exit(1)
+
+    weights = find_model_path()
+    print(f"Benchmarking {len(frames)} frames with weights {weights}\n")
+
+    reference = None
+    failed = False
+    for name in BACKENDS:
+        try:
+            backend = load_backend(name, weights)
+        except Exception as e:
+            print(f"{name:>9}: skipped ({e})")
+            continue
+
+        outputs, timings = run(backend, frames)
+        if reference is None:
+            reference = outputs
+        matched = sum(frames_match(ref, out) for ref, out in zip(reference, outputs))
+        failed = failed or matched != len(frames)
+        print(f"{name:>9}: {np.mean(timings):7.1f} ms/frame (p95 {np.percentile(timings, 95):7.1f})  "
+              f"parity {matched}/{len(frames)} frames")
+
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,46 @@
+import sys
+import json
+import time
+import cv2
+from detector import RESPONSE_MODES, get_model, process_frame
+from benchmark_batching import load_frames
+
+# Usage: python benchmark_response_modes.py <video_path> [max_frames]
+# Compares the live response modes (base64 / binary / detections): server CPU
+# per frame spent outside the model (decode, draw, JPEG encode, JSON) and
+# bytes on the wire per response.
+
+def run(payloads, mode):
+    cpu = 0.0
+    wire = 0
+    for payload in payloads:
+        # thread_time only counts this thread, so the batcher's model call is excluded
+        start = time.thread_time()
+        result = process_frame(payload, "", mode, send_alerts=False)
+        jpeg = result.pop("jpeg", None)
+        message = json.dumps(result)
+        cpu += time.thread_time() - start
+        wire += len(message.encode("utf-8")) + (len(jpeg) if jpeg is not None else 0)
+    return cpu / len(payloads) * 1000, wire / len(payloads)
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python benchmark_response_modes.py <video_path> [max_frames]")
+        sys.exit(1)
+
+    video_path = sys.argv[1]
+    max_frames = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+
+    frames = load_frames(video_path, max_frames)
+    if not frames:
+        print(f"Error: could not read frames from {video_path}")
+        sys.exit(1)
+    # What a client sends: one JPEG per frame
+    payloads = [cv2.imencode('.jpg', frame)[1].tobytes() for frame in frames]
+    print(f"Loaded {len(payloads)} frames from {video_path}")
+
+    get_model()(frames[0], conf=0.25, verbose=False)
+
+    for mode in RESPONSE_MODES:
+        cpu_ms, wire_bytes = run(payloads, mode)
+        print(f"{mode:<11} {cpu_ms:7.2f} ms CPU/frame  {wire_bytes / 1024:8.1f} KiB/response")
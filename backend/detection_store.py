@@ -0,0 +1,178 @@
+import asyncio
+from datetime import datetime, timezone
+from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING, ReturnDocument
+from progress import read_sidecar
+
+# Job results and individual detections in MongoDB, so questions like
+# "weapons above 60% this week" are an index scan instead of a walk over
+# every processed_*.json in uploads.
+#
+#   results     one document per processed upload (the job JSON plus user/filename)
+#   detections  one document per box: live frames and stills store every box,
+#               videos store one per track when tracking ran, otherwise one per
+#               box on each inferred frame (from the detections sidecar)
+
+STORE_BATCH = 1000 # Detections per insert_many
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp", ".webp")
+
+async def ensure_indexes(db):
+    # Equality fields first, then the sort (time), then the range (confidence)
+    await db.detections.create_index([("user", ASCENDING), ("class_id", ASCENDING), ("timestamp", DESCENDING), ("confidence", DESCENDING)])
+    await db.detections.create_index([("user", ASCENDING), ("timestamp", DESCENDING)])
+    await db.detections.create_index([("user", ASCENDING), ("camera_id", ASCENDING), ("timestamp", DESCENDING)])
+    await db.detections.create_index([("result_id", ASCENDING)])
+    await db.results.create_index([("user", ASCENDING), ("filename", ASCENDING)], unique=True)
+    await db.results.create_index([("user", ASCENDING), ("timestamp", DESCENDING)])
+
+def parse_timestamp(value):
+    # Result JSON timestamps are local "%Y-%m-%d %H:%M:%S" strings; store UTC
+    try:
+        return datetime.strptime(value, "%Y-%m-%d %H:%M:%S").astimezone(timezone.utc)
+    except (TypeError, ValueError):
+        return datetime.now(timezone.utc)
+
+def _detection(user, camera_id, source, result_id, timestamp, det, **extra):
+    doc = {
+        "user": user,
+        "camera_id": camera_id,
+        "source": source,
+        "result_id": result_id,
+        "timestamp": timestamp,
+        "class_id": det["class_id"],
+        "label": str(det["label"]).lower(),
+        "confidence": round(float(det["confidence"]), 4),
+        "box": det.get("box"),
+    }
+    doc.update(extra)
+    return doc
+
+def video_detections(result, sidecar_path):
+    # Yields detection dicts (with frame/video_time/track_id extras) for a video job
+    if result.get("tracks") is not None:
+        for track in result["tracks"]:
+            yield {
+                "class_id": track["class_id"],
+                "label": track["label"],
+                "confidence": track["max_confidence"],
+                "frame": track["first_frame"],
+                "video_time": track["first_seen"],
+                "track_id": track["track_id"],
+                "last_frame": track["last_frame"],
+            }
+        return
+    if not sidecar_path:
+        return
+    cursor = 0
+    while True:
+        page = read_sidecar(sidecar_path, cursor, 5000)
+        for record in page["frames"]:
+            if not record["inferred"]:
+                continue # Skipped frames repeat the last inferred boxes
+            for det in record["detections"]:
+                yield dict(det, frame=record["frame"], video_time=record["t"])
+        if page["eof"] or page["next_cursor"] == cursor:
+            return
+        cursor = page["next_cursor"]
+
+async def store_result(db, user, filename, result, camera_id=None, sidecar_json_path=None):
+    # Upsert the job result and replace its detections; returns the number stored.
+    # sidecar_json_path is the processed_*.json path the detections sidecar sits next to.
+    if result.get("status") != "completed":
+        return 0
+    timestamp = parse_timestamp(result.get("timestamp"))
+    camera_id = camera_id or result.get("camera_id")
+    doc = dict(result, user=user, filename=filename, camera_id=camera_id, timestamp=timestamp)
+    doc.pop("_id", None)
+    saved = await db.results.find_one_and_update(
+        {"user": user, "filename": filename},
+        {"$set": doc},
+        upsert=True,
+        projection={"_id": 1},
+        return_document=ReturnDocument.AFTER,
+    )
+    result_id = saved["_id"]
+    await db.detections.delete_many({"result_id": result_id})
+
+    if filename.lower().endswith(IMAGE_EXTENSIONS):
+        source, dets = "image", result.get("detections") or []
+    else:
+        # Reading the sidecar is file I/O; keep it off the event loop
+        loop = asyncio.get_running_loop()
+        source, dets = "video", await loop.run_in_executor(None, lambda: list(video_detections(result, sidecar_json_path)))
+
+    stored = 0
+    batch = []
+    for det in dets:
+        extra = {key: det[key] for key in ("frame", "video_time", "track_id", "last_frame") if key in det}
+        batch.append(_detection(user, camera_id, source, result_id, timestamp, det, **extra))
+        if len(batch) >= STORE_BATCH:
+            await db.detections.insert_many(batch)
+            stored += len(batch)
+            batch = []
+    if batch:
+        await db.detections.insert_many(batch)
+        stored += len(batch)
+    return stored
+
+async def store_live(db, user, result, camera_id=None):
+    # Live frames are only worth keeping when something was seen
+    if not result.get("detections"):
+        return 0
+    timestamp = datetime.now(timezone.utc)
+    docs = [_detection(user, camera_id, "live", None, timestamp, det) for det in result["detections"]]
+    await db.detections.insert_many(docs)
+    return len(docs)
+
+def encode_cursor(doc):
+    return f"{int(doc['timestamp'].replace(tzinfo=timezone.utc).timestamp() * 1000)}_{doc['_id']}"
+
+def decode_cursor(cursor):
+    millis, oid = cursor.split("_", 1)
+    return datetime.fromtimestamp(int(millis) / 1000, timezone.utc), ObjectId(oid)
+
+async def query_detections(db, user, class_ids=None, min_confidence=None, since=None, until=None,
+                           camera_id=None, source=None, cursor=None, limit=100):
+    # Newest first; keyset pagination on (timestamp, _id) so deep pages stay cheap
+    query = {"user": user}
+    if class_ids:
+        query["class_id"] = {"$in": class_ids}
+    if camera_id:
+        query["camera_id"] = camera_id
+    if source:
+        query["source"] = source
+    if min_confidence is not None:
+        query["confidence"] = {"$gte": min_confidence}
+    if since or until:
+        query["timestamp"] = {}
+        if since:
+            query["timestamp"]["$gte"] = since
+        if until:
+            query["timestamp"]["$lt"] = until
+    if cursor:
+        ts, oid = decode_cursor(cursor)
+        query["$or"] = [{"timestamp": {"$lt": ts}}, {"timestamp": ts, "_id": {"$lt": oid}}]
+
+    docs = await db.detections.find(query).sort([("timestamp", DESCENDING), ("_id", DESCENDING)]).limit(limit + 1).to_list(limit + 1)
+    has_more = len(docs) > limit
+    docs = docs[:limit]
+    next_cursor = encode_cursor(docs[-1]) if has_more else None
+    for doc in docs:
+        doc["_id"] = str(doc["_id"])
+        doc["result_id"] = str(doc["result_id"]) if doc["result_id"] else None
+        doc["timestamp"] = doc["timestamp"].replace(tzinfo=timezone.utc).isoformat()
+    return {"detections": docs, "next_cursor": next_cursor}
+
+_tasks = set()
+
+def spawn(coro):
+    # Fire-and-forget a store coroutine on the running loop, logging failures
+    task = asyncio.ensure_future(coro)
+    _tasks.add(task)
+    task.add_done_callback(_task_done)
+    return task
+
+def _task_done(task):
+    _tasks.discard(task)
+    if not task.cancelled() and task.exception():
+        print(f"Warning: Detection store write failed: {task.exception()}", flush=True)
@@ -1,40 +1,155 @@
 import cv2
-from ultralytics import YOLO
 import os
 import json
 import time
-from mailer import send_alert_email
+import threading
+from mailer import queue_alert_email
+from location import get_location_provider
+from rate_limit import get_alert_limiter
+from video_pipeline import run_pipeline
+from progress import VideoProgress
+from batcher import FrameBatcher
+from tracker import ByteTracker, TRACK_LOW_CONF, TRACK_MATCH_IOU, TRACK_MAX_AGE, TRACK_MIN_HITS
+from video_output import VIDEO_OUTPUT, CLIP_PRE_SECONDS, CLIP_POST_SECONDS, open_video_output
+from backends import INFERENCE_BACKEND, INFERENCE_IMGSZ, INFERENCE_INT8, load_backend
 import numpy as np
 import base64
 from datetime import datetime
 import random
-
-# Load the TRAINED model
-# Dynamically find the latest run
 import glob
+import hashlib
+
+# The TRAINED model is loaded lazily on first use (or by warmup()), so importing
+# this module stays cheap for the API process and helper scripts.
+_model = None
+_model_lock = threading.Lock()
+_model_ready = threading.Event()
+# Live frames from all clients share one micro-batching scheduler (see batcher.py)
+_live_batcher = None
+
+DEFAULT_MODEL_PATH = r"C:\Users\sravs\.gemini\antigravity\scratch\wildeye_ai\backend\runs\detect\train2\weights\best.pt"
+
+def latest_model_path():
+    # Dynamically find the latest run (no logging; called on every upload by model_version())
+    # Base runs directory
+    runs_dir = os.path.join(os.path.dirname(__file__), "runs", "detect")
+    # Find all train folders
+    train_dirs = glob.glob(os.path.join(runs_dir, "train*"))
+    # Sort by modification time (newest last)
+    train_dirs.sort(key=os.path.getmtime)
 
-# Base runs directory
-runs_dir = os.path.join(os.path.dirname(__file__), "runs", "detect")
-# Find all train folders
-train_dirs = glob.glob(os.path.join(runs_dir, "train*"))
-# Sort by modification time (newest last)
-train_dirs.sort(key=os.path.getmtime)
-
-if train_dirs:
-    latest_run = train_dirs[-1]
-    # Use last.pt because best.pt might not have updated if validation didn't improve, but last.pt has the latest epoch
-    model_path = os.path.join(latest_run, "weights", "last.pt")
-    print(f"Loading LATEST model from: {model_path}")
-else:
+    if train_dirs:
+        latest_run = train_dirs[-1]
+        # Use last.pt because best.pt might not have updated if validation didn't improve, but last.pt has the latest epoch
+        return os.path.join(latest_run, "weights", "last.pt")
     # Fallback
-    model_path = r"C:\Users\sravs\.gemini\antigravity\scratch\wildeye_ai\backend\runs\detect\train2\weights\best.pt"
-    print(f"No new runs found. Loading default: {model_path}")
+    return DEFAULT_MODEL_PATH
+
+def find_model_path():
+    # latest_model_path(), for callers that are about to load it
+    model_path = latest_model_path()
+    if model_path == DEFAULT_MODEL_PATH:
+        print(f"No new runs found. Loading default: {model_path}")
+    else:
+        print(f"Loading LATEST model from: {model_path}")
+    return model_path
+
+def model_version():
+    # Short id of the weights plus every setting that changes video/image output;
+    # cached results are only reused while this stays the same
+    weights = latest_model_path()
+    try:
+        stat = os.stat(weights)
+        ident = f"{weights}:{stat.st_size}:{int(stat.st_mtime)}"
+    except OSError:
+        ident = weights
+    ident += (f"|{INFERENCE_BACKEND}|{INFERENCE_IMGSZ}|{INFERENCE_INT8}|{VIDEO_CONF}|{IMAGE_CONF}"
+              f"|{MOTION_GATING}|{MOTION_THRESHOLD}|{MOTION_PIXEL_DELTA}|{MOTION_MAX_SKIP}"
+              f"|{TILED_INFERENCE}|{TILE_MIN_SIDE}|{TILE_SIZE}|{TILE_OVERLAP}|{TILE_NMS_IOU}"
+              f"|{TRACKING}|{DETECT_EVERY}|{TRACK_LOW_CONF}|{TRACK_MATCH_IOU}|{TRACK_MAX_AGE}|{TRACK_MIN_HITS}"
+              f"|{VIDEO_OUTPUT}|{CLIP_PRE_SECONDS}|{CLIP_POST_SECONDS}")
+    return hashlib.sha256(ident.encode()).hexdigest()[:12]
+
+def get_model():
+    global _model
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                _model = load_backend(INFERENCE_BACKEND, find_model_path(), imgsz=INFERENCE_IMGSZ, int8=INFERENCE_INT8)
+    return _model
+
+def warmup():
+    # Load the model and run one dummy inference so the first real request
+    # doesn't pay graph setup
+    # Prefetch the server location so the first alert already has it
+    get_location_provider().refresh()
+    try:
+        start = time.time()
+        get_model()(np.zeros((640, 640, 3), dtype=np.uint8), conf=VIDEO_CONF, verbose=False)
+        _model_ready.set()
+        print(f"DEBUG: Model warm after {time.time() - start:.1f}s", flush=True)
+    except Exception as e:
+        print(f"ERROR: Model warmup failed: {e}", flush=True)
+
+def is_ready():
+    return _model_ready.is_set()
 
-model = YOLO(model_path)
+def get_live_batcher():
+    global _live_batcher
+    if _live_batcher is None:
+        with _model_lock:
+            if _live_batcher is None:
+                _live_batcher = FrameBatcher(lambda frames: get_model()(frames, conf=LIVE_CONF))
+    return _live_batcher
 
-# Global variable for rate limiting
-last_email_time = 0
-EMAIL_COOLDOWN = 60 # Seconds
+# Job events (progress) are pushed to the API process through this queue when
+# running inside an inference worker; see jobs.py
+_event_sink = None
+
+def set_event_sink(sink):
+    global _event_sink
+    _event_sink = sink
+
+def emit_event(job_id, event, data):
+    if _event_sink is None or not job_id:
+        return
+    try:
+        _event_sink.put_nowait((job_id, event, data))
+    except Exception as e:
+        print(f"Warning: Could not emit {event} event: {e}", flush=True)
+
+# Model confidence thresholds per input type
+VIDEO_CONF = float(os.getenv("VIDEO_CONF", "0.25"))
+IMAGE_CONF = float(os.getenv("IMAGE_CONF", "0.15"))
+IMAGE_RANGER_MARGIN = 0.2 # Rangers need IMAGE_CONF + this in stills; they never raise an alert, so be stricter
+LIVE_CONF = float(os.getenv("LIVE_CONF", "0.15"))
+
+# Number of video frames sent to the model in a single call
+VIDEO_BATCH_SIZE = int(os.getenv("VIDEO_BATCH_SIZE", "8"))
+
+# Motion gating: skip the model on video frames where the scene hasn't changed
+MOTION_GATING = os.getenv("MOTION_GATING", "0") == "1"
+MOTION_THRESHOLD = float(os.getenv("MOTION_THRESHOLD", "0.02")) # Fraction of pixels that must change
+MOTION_PIXEL_DELTA = int(os.getenv("MOTION_PIXEL_DELTA", "25")) # Grey-level change that counts as motion
+MOTION_MAX_SKIP = int(os.getenv("MOTION_MAX_SKIP", "30")) # Force inference after this many skipped frames
+
+# Batches buffered between the decode, inference and encode stages
+VIDEO_QUEUE_SIZE = int(os.getenv("VIDEO_QUEUE_SIZE", "4"))
+
+# Tiled inference for high-resolution stills: images whose longest side exceeds
+# TILE_MIN_SIDE are split into overlapping tiles so small, distant subjects
+# aren't lost when the whole frame is shrunk to the model's input size
+TILED_INFERENCE = os.getenv("TILED_INFERENCE", "0") == "1"
+TILE_MIN_SIDE = int(os.getenv("TILE_MIN_SIDE", "2000"))
+TILE_SIZE = int(os.getenv("TILE_SIZE", "960"))
+TILE_OVERLAP = float(os.getenv("TILE_OVERLAP", "0.2"))
+TILE_NMS_IOU = float(os.getenv("TILE_NMS_IOU", "0.5"))
+
+# Multi-object tracking for videos (see tracker.py): boxes get track IDs and the
+# job JSON gets one summary per track. With DETECT_EVERY > 1 the detector only
+# runs on every Nth frame and the tracker carries the boxes in between.
+TRACKING = os.getenv("TRACKING", "0") == "1"
+DETECT_EVERY = int(os.getenv("DETECT_EVERY", "1"))
 
 # Custom Model Classes (from data.yaml)
 # 0: poacher
@@ -42,7 +157,265 @@ EMAIL_COOLDOWN = 60 # Seconds
 # 2: weapon
 # 3: ww
 
-def process_video(video_path: str, user_email: str):
+def read_frame_batches(cap, batch_size):
+    # Yield lists of up to batch_size decoded frames, in order
+    batch = []
+    while cap.isOpened():
+        ret, frame = cap.read()
+        if not ret:
+            break
+        batch.append(frame)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+class MotionGate:
+    """Frame-differencing gate that decides which video frames need a model pass."""
+
+    def __init__(self, threshold=MOTION_THRESHOLD, max_skip=MOTION_MAX_SKIP, pixel_delta=MOTION_PIXEL_DELTA):
+        self.threshold = threshold
+        self.max_skip = max_skip
+        self.pixel_delta = pixel_delta
+        self.reference = None # Downscaled grey copy of the last inferred frame
+        self.skipped = 0
+
+    def should_infer(self, frame):
+        small = cv2.resize(frame, (160, 90), interpolation=cv2.INTER_AREA)
+        small = cv2.GaussianBlur(cv2.cvtColor(small, cv2.COLOR_BGR2GRAY), (5, 5), 0)
+        
+        if self.reference is None or self.skipped >= self.max_skip:
+            infer = True
+        else:
+            # Compare against the last inferred frame so slow changes still add up
+            diff = cv2.absdiff(small, self.reference)
+            changed = np.count_nonzero(diff > self.pixel_delta) / diff.size
+            infer = bool(changed >= self.threshold)
+        
+        if infer:
+            self.reference = small
+            self.skipped = 0
+        else:
+            self.skipped += 1
+        return infer
+
+def tile_windows(width, height, tile_size=TILE_SIZE, overlap=TILE_OVERLAP):
+    # Overlapping (x1, y1, x2, y2) windows covering the image; the last row and
+    # column are shifted back so every tile is full size
+    step = max(1, int(tile_size * (1 - overlap)))
+    
+    def starts(length):
+        if length <= tile_size:
+            return [0]
+        positions = list(range(0, length - tile_size + 1, step))
+        if positions[-1] + tile_size < length:
+            positions.append(length - tile_size)
+        return positions
+    
+    return [(x, y, min(x + tile_size, width), min(y + tile_size, height)) for y in starts(height) for x in starts(width)]
+
+def merge_boxes(boxes, iou_threshold=TILE_NMS_IOU):
+    # Class-aware NMS across tiles; boxes are (x1, y1, x2, y2, cls, conf)
+    merged = []
+    for cls in set(box[4] for box in boxes):
+        class_boxes = [box for box in boxes if box[4] == cls]
+        rects = [[box[0], box[1], box[2] - box[0], box[3] - box[1]] for box in class_boxes]
+        scores = [box[5] for box in class_boxes]
+        keep = cv2.dnn.NMSBoxes(rects, scores, 0.0, iou_threshold)
+        merged.extend(class_boxes[i] for i in np.array(keep).flatten())
+    return sorted(merged, key=lambda box: box[5], reverse=True)
+
+def detect_boxes(frame, conf, tiled=None):
+    # Returns (boxes, tile_count) with boxes as (x1, y1, x2, y2, cls, conf) in frame pixels
+    model = get_model()
+    height, width = frame.shape[:2]
+    if tiled is None:
+        tiled = TILED_INFERENCE
+    
+    if not tiled or max(width, height) <= TILE_MIN_SIDE:
+        results = model(frame, conf=conf)
+        return [(*map(int, box.xyxy[0]), int(box.cls[0]), float(box.conf[0])) for box in results[0].boxes], 0
+    
+    # All tiles plus the whole frame (for subjects larger than a tile) in one batch
+    windows = tile_windows(width, height)
+    crops = [frame[y1:y2, x1:x2] for x1, y1, x2, y2 in windows]
+    results = model(crops + [frame], conf=conf)
+    
+    boxes = []
+    for (off_x, off_y, _, _), result in zip(windows + [(0, 0, width, height)], results):
+        for box in result.boxes:
+            x1, y1, x2, y2 = map(int, box.xyxy[0])
+            boxes.append((x1 + off_x, y1 + off_y, x2 + off_x, y2 + off_y, int(box.cls[0]), float(box.conf[0])))
+    print(f"DEBUG: Tiled inference over {len(windows)} tiles, {len(boxes)} raw boxes", flush=True)
+    return merge_boxes(boxes), len(windows)
+
+TRACK_COLORS = {0: (0, 0, 255), 1: (0, 255, 0), 2: (0, 0, 255), 3: (0, 165, 255)}
+
+def draw_tracks(frame, detections):
+    for det in detections:
+        x1, y1, x2, y2 = det["box"]
+        color = TRACK_COLORS.get(det["class_id"], (255, 255, 255))
+        cv2.rectangle(frame, (x1, y1), (x2, y2), color, 2)
+        cv2.putText(frame, f"#{det['track_id']} {det['label']} {int(det['confidence']*100)}%", (x1, y1-10), cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
+    return frame
+
+def run_video_pipeline(cap, out, batch_size, gate=None, progress=None, tracker=None, detect_every=1):
+    # Decode -> inference -> annotate+encode, each stage on its own thread
+    model = get_model()
+    stats = {
+        "poacher_detected": False,
+        "weapon_detected": False,
+        "max_poacher_conf": 0.0,
+        "max_weapon_conf": 0.0,
+        "frames_total": 0,
+        "frames_inferred": 0,
+        "alert_image": None,
+    }
+    best_threat = 0.0
+    last_result = None
+    last_detections = []
+    # With a tracker the detector can run sparsely and weak boxes are kept to extend tracks
+    conf = TRACK_LOW_CONF if tracker else VIDEO_CONF
+    
+    def decode():
+        index = 0
+        for frames in read_frame_batches(cap, batch_size):
+            infer_flags = []
+            for frame in frames:
+                keyframe = index % detect_every == 0
+                infer_flags.append(keyframe and (gate.should_infer(frame) if gate else True))
+                index += 1
+            yield frames, infer_flags
+    
+    def infer(item):
+        nonlocal last_result, last_detections
+        frames, infer_flags = item
+        
+        # One model call per batch; results come back in frame order
+        to_infer = [frame for frame, flag in zip(frames, infer_flags) if flag]
+        results = iter(model(to_infer, conf=conf)) if to_infer else iter(())
+        
+        planned = []
+        for frame, flag in zip(frames, infer_flags):
+            index = stats["frames_total"]
+            stats["frames_total"] += 1
+            boxes = None
+            if flag:
+                last_result = next(results)
+                last_detections = []
+                boxes = []
+                stats["frames_inferred"] += 1
+                
+                for box in last_result.boxes:
+                    cls = int(box.cls[0])
+                    box_conf = float(box.conf[0])
+                    boxes.append((*map(int, box.xyxy[0]), cls, box_conf))
+                    if box_conf < VIDEO_CONF:
+                        continue # Only used to extend tracks
+                    last_detections.append({
+                        "box": list(map(int, box.xyxy[0])),
+                        "class_id": cls,
+                        "label": model.names[cls],
+                        "confidence": box_conf
+                    })
+                    
+                    if cls == 0: # Poacher
+                        stats["poacher_detected"] = True
+                        stats["max_poacher_conf"] = max(stats["max_poacher_conf"], box_conf)
+                    if cls == 2 or cls == 3: # Weapon
+                        stats["weapon_detected"] = True
+                        stats["max_weapon_conf"] = max(stats["max_weapon_conf"], box_conf)
+            
+            if tracker:
+                # Every frame advances the tracker; detector frames also correct it
+                last_detections = [{
+                    "track_id": track_id,
+                    "box": box,
+                    "class_id": cls,
+                    "label": model.names[cls],
+                    "confidence": track_conf
+                } for track_id, box, cls, track_conf in tracker.step(index, boxes)]
+            
+            planned.append((index, frame, last_result, flag, last_detections))
+        return planned
+    
+    def encode(planned):
+        nonlocal best_threat
+        for index, frame, result, inferred, detections in planned:
+            # Frames the output won't show (outside event clips) are never drawn
+            if not out.needs_annotation(index, detections):
+                annotated = None
+            elif tracker:
+                annotated = draw_tracks(frame, detections)
+            elif inferred:
+                annotated = result.plot() # Use default plot for video for speed
+            else:
+                # Static scene: redraw the last detections on this frame
+                annotated = result.plot(img=frame)
+            out.write(index, frame, annotated, detections)
+            
+            # Keep the most confident poacher/weapon frame as the alert email picture
+            threat = max((det["confidence"] for det in detections if det["class_id"] in (0, 2, 3)), default=0.0)
+            if inferred and threat > best_threat:
+                best_threat = threat
+                stats["alert_image"] = cv2.imencode('.jpg', annotated)[1].tobytes()
+            if progress:
+                progress.add_frame(index, inferred, detections)
+    
+    stats["stage_timings"] = run_pipeline(decode, infer, encode, queue_size=VIDEO_QUEUE_SIZE)
+    return stats
+
+def alert_image_path(video_path):
+    # processed_<name>.alert.jpg: the frame attached to a job's alert email
+    directory, filename = os.path.split(os.path.abspath(video_path))
+    return os.path.join(directory, f"processed_{os.path.splitext(filename)[0]}.alert.jpg")
+
+def send_upload_alert(user_email, camera_id, alert_image, image_name):
+    # Email Alert Logic for uploads (Rate limited per user and camera, see rate_limit.py).
+    # Returns the result's mail_sent text.
+    if not get_alert_limiter().allow(user_email, camera_id):
+        print(f"DEBUG: Alert for {user_email}/{camera_id} rate limited", flush=True)
+        return "No (Rate limited)"
+    
+    # Camera/user coordinates or the cached server location; never a network call here
+    maps_link = get_location_provider().maps_link(camera_id, user_email)
+    
+    # Prioritize logged-in user's email
+    recipient = user_email
+    
+    # Simple validation
+    if "@" not in recipient:
+        print(f"Warning: User '{recipient}' does not look like an email. Falling back to MAIL_RECIPIENT.")
+        recipient = os.getenv("MAIL_RECIPIENT")
+    
+    mail_sent = False
+    if recipient:
+        print(f"Sending email to {recipient} with location: {maps_link}")
+        mail_sent = queue_alert_email(recipient, alert_image, location_link=maps_link, image_name=image_name)
+    else:
+        print("Error: No valid recipient email found.")
+    if not mail_sent:
+        # Nothing was sent, so don't hold the key's cooldown against the next alert
+        get_alert_limiter().refund(user_email, camera_id)
+        return "No (Check .env)"
+    return "Queued"
+
+def alert_for_result(video_path, result, user_email, camera_id=None):
+    # Alert one more user about a finished result: a cached duplicate upload, or
+    # a user who joined a job that someone else started. Returns their mail_sent.
+    if not (result.get("poacher_detected") or result.get("weapon_detected") == "Yes"):
+        return "N/A"
+    print(f"ALERT: Threat in {os.path.basename(video_path)} for {user_email}", flush=True)
+    alert_image = None
+    image_path = alert_image_path(video_path)
+    if os.path.exists(image_path):
+        with open(image_path, "rb") as f:
+            alert_image = f.read()
+    return send_upload_alert(user_email, camera_id, alert_image, os.path.splitext(os.path.basename(video_path))[0] + ".jpg")
+
+def process_video(video_path: str, user_email: str, batch_size: int = None, motion_gating: bool = None, job_id: str = None,
+                  tracking: bool = None, detect_every: int = None, camera_id: str = None, output_mode: str = None):
     print(f"DEBUG: process_video STARTED for {video_path}", flush=True)
     
     # Ensure absolute path
@@ -62,6 +435,17 @@ def process_video(video_path: str, user_email: str):
     weapon_detected = False
     max_poacher_conf = 0.0
     max_weapon_conf = 0.0
+    frames_total = 0
+    frames_inferred = 0
+    stage_timings = None
+    tiles = 0
+    detections_sidecar = None
+    tracks = None
+    alert_image = None # JPEG attached to the alert email
+    fps = None
+    video_url = f"/uploads/{os.path.basename(output_path)}"
+    clips = None
+    video_file_url = None
     
     try:
         if is_image:
@@ -92,8 +476,10 @@ def process_video(video_path: str, user_email: str):
             
             annotated_frame = frame.copy()
             
-            # Run with reasonable confidence
-            results = model(frame, conf=0.15)
+            # Run with reasonable confidence (tiled for large stills)
+            model = get_model()
+            boxes, tiles = detect_boxes(frame, IMAGE_CONF)
+            frames_total = frames_inferred = 1
             
             detections = []
             
@@ -101,11 +487,7 @@ def process_video(video_path: str, user_email: str):
             with open("debug_output.txt", "a", encoding="utf-8") as f:
                 f.write(f"\n--- Processing {filename} ---\n")
             
-            for box in results[0].boxes:
-                x1, y1, x2, y2 = map(int, box.xyxy[0])
-                cls = int(box.cls[0])
-                conf = float(box.conf[0])
-                
+            for x1, y1, x2, y2, cls, conf in boxes:
                 # Default values
                 label = model.names[cls]
                 color = (255, 255, 255) # White
@@ -117,26 +499,26 @@ def process_video(video_path: str, user_email: str):
                 
                 valid_detection = False
 
-                if cls == 0 and conf > 0.15: # Poacher (Lowered threshold)
+                if cls == 0 and conf > IMAGE_CONF: # Poacher (Lowered threshold)
                     label = "Poacher"
                     color = (0, 0, 255) # Red
                     poacher_detected = True
                     max_poacher_conf = max(max_poacher_conf, conf)
                     valid_detection = True
                     
-                elif cls == 1 and conf > 0.35: # Ranger
+                elif cls == 1 and conf > IMAGE_CONF + IMAGE_RANGER_MARGIN: # Ranger
                     label = "Ranger"
                     color = (0, 255, 0) # Green
                     valid_detection = True
                     
-                elif cls == 2 and conf > 0.15: # Weapon
+                elif cls == 2 and conf > IMAGE_CONF: # Weapon
                     label = "Weapon"
                     color = (0, 0, 255) # Red
                     weapon_detected = True
                     max_weapon_conf = max(max_weapon_conf, conf)
                     valid_detection = True
 
-                elif cls == 3 and conf > 0.15: # WW (Treating as suspicious/weapon)
+                elif cls == 3 and conf > IMAGE_CONF: # WW (Treating as suspicious/weapon)
                     label = "WW"
                     color = (0, 165, 255) # Orange
                     weapon_detected = True # Trigger alert for WW too
@@ -159,81 +541,85 @@ def process_video(video_path: str, user_email: str):
                     cv2.putText(annotated_frame, display_label, (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.9, color, 2)
             
             cv2.imwrite(output_path, annotated_frame)
+            alert_image = cv2.imencode('.jpg', annotated_frame)[1].tobytes()
             
         else:
             # Video Processing
             cap = cv2.VideoCapture(video_path)
             if not cap.isOpened():
                 print("Error opening video file")
+                error_data = {"status": "error", "message": "Could not open video file"}
                 with open(json_path, "w") as f:
-                    json.dump({"status": "error", "message": "Could not open video file"}, f)
-                return
+                    json.dump(error_data, f)
+                return error_data
     
             width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
             height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
             fps = int(cap.get(cv2.CAP_PROP_FPS))
             
-            fourcc = cv2.VideoWriter_fourcc(*'mp4v') 
-            out = cv2.VideoWriter(output_path, fourcc, fps, (width, height))
+            # Event clips by default; VIDEO_OUTPUT=full or hls re-encodes the whole video
+            output_mode = output_mode or VIDEO_OUTPUT
+            out = open_video_output(output_mode, output_path, video_path, fps, (width, height))
+            print(f"DEBUG: Video output: {output_mode}", flush=True)
             
-            while cap.isOpened():
-                ret, frame = cap.read()
-                if not ret:
-                    break
-                
-                results = model(frame, conf=0.25)
-                annotated_frame = results[0].plot() # Use default plot for video for speed
-                
-                for box in results[0].boxes:
-                    cls = int(box.cls[0])
-                    conf = float(box.conf[0])
-                    
-                    if cls == 0: # Poacher
-                        poacher_detected = True
-                        max_poacher_conf = max(max_poacher_conf, conf)
-                    if cls == 2 or cls == 3: # Weapon
-                        weapon_detected = True
-                        max_weapon_conf = max(max_weapon_conf, conf)
-                    
-                out.write(annotated_frame)
-    
-            cap.release()
-            out.release()
-        
-        mail_sent = False
-        if poacher_detected or weapon_detected:
-            print(f"ALERT: Threat detected! Poacher: {poacher_detected}, Weapon: {weapon_detected}")
+            batch_size = max(1, batch_size or VIDEO_BATCH_SIZE)
+            print(f"DEBUG: Video inference batch size: {batch_size}", flush=True)
             
-            # Get Real Location (IP-based)
-            try:
-                import requests
-                # Short timeout to not block processing
-                response = requests.get("https://ipinfo.io/json", timeout=2)
-                data = response.json()
-                loc = data.get("loc", "").split(",")
-                if len(loc) == 2:
-                    lat, lng = loc[0], loc[1]
-                else:
-                    raise Exception("Invalid location data")
-            except Exception as e:
-                print(f"Warning: Could not get real location ({e}). Using default.")
-                lat, lng = "17.3850", "78.4867" # Default to Hyderabad (or user's approximate area)
+            if motion_gating is None:
+                motion_gating = MOTION_GATING
+            gate = MotionGate() if motion_gating else None
             
-            maps_link = f"https://www.google.com/maps/search/?api=1&query={lat},{lng}"
+            # Sparse detection only makes sense with the tracker filling the gaps
+            detect_every = max(1, detect_every or DETECT_EVERY)
+            if tracking is None:
+                tracking = TRACKING or detect_every > 1
+            tracker = ByteTracker(VIDEO_CONF) if tracking else None
+            if not tracker:
+                detect_every = 1
+            print(f"DEBUG: Tracking: {bool(tracker)}, detector every {detect_every} frame(s)", flush=True)
             
-            # Prioritize logged-in user's email
-            recipient = user_email
+            # Per-frame detections sidecar + progress record, written as frames are encoded
+            progress = VideoProgress(json_path, int(cap.get(cv2.CAP_PROP_FRAME_COUNT)), fps,
+                                     on_update=lambda record: emit_event(job_id, "progress", record), extra=out.progress_info)
+            detections_sidecar = f"/uploads/{os.path.basename(progress.sidecar_path)}"
             
-            # Simple validation
-            if "@" not in recipient:
-                print(f"Warning: User '{recipient}' does not look like an email. Falling back to MAIL_RECIPIENT.")
-                recipient = os.getenv("MAIL_RECIPIENT")
+            try:
+                stats = run_video_pipeline(cap, out, batch_size, gate, progress, tracker, detect_every)
+                progress.close("completed")
+            except Exception:
+                progress.close("error")
+                raise
+            finally:
+                cap.release()
+                out.close()
             
-            if recipient:
-                print(f"Sending email to {recipient} with location: {maps_link}")
-                mail_sent = send_alert_email(output_path, recipient, location_link=maps_link)
-            else:
-                print("Error: No valid recipient email found.")
+            poacher_detected = stats["poacher_detected"]
+            weapon_detected = stats["weapon_detected"]
+            max_poacher_conf = stats["max_poacher_conf"]
+            max_weapon_conf = stats["max_weapon_conf"]
+            frames_total = stats["frames_total"]
+            frames_inferred = stats["frames_inferred"]
+            stage_timings = stats["stage_timings"]
+            alert_image = stats["alert_image"]
+            output = out.summary()
+            video_url = output["video_url"]
+            output_mode = output["output_mode"]
+            clips = output["clips"]
+            video_file_url = output.get("video_file_url")
+            if tracker:
+                tracks = tracker.summaries(get_model().names, fps)
+            
+            print(f"DEBUG: Inferred {frames_inferred}/{frames_total} frames", flush=True)
+            print(f"DEBUG: Stage timings (s): {stage_timings}", flush=True)
+        
+        mail_sent = "N/A"
+        if poacher_detected or weapon_detected:
+            print(f"ALERT: Threat detected! Poacher: {poacher_detected}, Weapon: {weapon_detected}")
+            if alert_image is not None:
+                # Kept so later uploads of the same file can alert their users from the cache
+                with open(alert_image_path(video_path), "wb") as f:
+                    f.write(alert_image)
+            mail_sent = send_upload_alert(user_email, camera_id, alert_image, os.path.splitext(filename)[0] + ".jpg")
     
         # Save results to JSON
         results_data = {
@@ -242,25 +628,52 @@ def process_video(video_path: str, user_email: str):
             "weapon_detected": "Yes" if weapon_detected else "No",
             "poacher_confidence": round(max_poacher_conf * 100, 1),
             "weapon_confidence": round(max_weapon_conf * 100, 1),
-            "mail_sent": "Yes" if mail_sent else "No (Check .env)" if (poacher_detected or weapon_detected) else "N/A",
+            "mail_sent": mail_sent,
             "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-            "video_url": f"/uploads/{os.path.basename(output_path)}",
-            "detections": detections if is_image else [] 
+            "video_url": video_url,
+            "output_mode": output_mode if not is_image else None,
+            "clips": clips,
+            "video_file_url": video_file_url,
+            "fps": fps,
+            "detections": detections if is_image else [],
+            "frames_total": frames_total,
+            "frames_inferred": frames_inferred,
+            "stage_timings": stage_timings,
+            "tiles": tiles,
+            "detections_sidecar": detections_sidecar,
+            "tracks": tracks,
+            "camera_id": camera_id
         }
         
         with open(json_path, "w") as f:
             json.dump(results_data, f)
     
-        print(f"Finished processing. Saved to {output_path}")
+        print(f"Finished processing. Output: {video_url}")
+        return results_data
 
     except Exception as e:
         print(f"Error processing video: {e}")
+        error_data = {"status": "error", "message": str(e)}
         with open(json_path, "w") as f:
-            json.dump({"status": "error", "message": str(e)}, f)
+            json.dump(error_data, f)
+        return error_data
 
 
-def process_frame(image_bytes, user_email: str):
-    global last_email_time
+# Live response modes:
+#   base64     - annotated JPEG as a data URL inside the JSON (original behaviour)
+#   binary     - JSON without the image; the annotated JPEG is returned raw under "jpeg"
+#                for the caller to send separately (WebSocket binary message / image body)
+#   detections - JSON only; the client already has the frame and draws the boxes itself
+RESPONSE_MODES = ("base64", "binary", "detections")
+
+def draw_live_boxes(frame, boxes):
+    for x1, y1, x2, y2, label, conf, color in boxes:
+        cv2.rectangle(frame, (x1, y1), (x2, y2), color, 2)
+        cv2.putText(frame, f"{label} {int(conf*100)}%", (x1, y1-10), cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
+
+def process_frame(image_bytes, user_email: str, response_mode: str = "base64", send_alerts: bool = True, camera_id: str = None):
+    if response_mode not in RESPONSE_MODES:
+        return {"error": f"Unknown response mode '{response_mode}'"}
     
     # Decode image
     nparr = np.frombuffer(image_bytes, np.uint8)
@@ -270,9 +683,12 @@ def process_frame(image_bytes, user_email: str):
         return {"error": "Could not decode image"}
 
     # Run detection
-    results = model(frame, conf=0.15) # Lowered conf for better detection
+    model = get_model()
+    # Batched with frames from other live clients; conf is lowered for better detection
+    results = [get_live_batcher().infer(frame)]
     
     detections = []
+    drawn = []
     poacher_detected = False
     weapon_detected = False
     max_poacher_conf = 0.0
@@ -310,9 +726,8 @@ def process_frame(image_bytes, user_email: str):
             weapon_detected = True
             max_weapon_conf = max(max_weapon_conf, conf)
         
-        # Draw on frame
-        cv2.rectangle(frame, (x1, y1), (x2, y2), color, 2)
-        cv2.putText(frame, f"{label} {int(conf*100)}%", (x1, y1-10), cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
+        # Drawn only if an image goes back to the client or out in an alert
+        drawn.append((x1, y1, x2, y2, label, conf, color))
 
         detections.append({
             "box": [x1, y1, x2, y2],
@@ -321,35 +736,24 @@ def process_frame(image_bytes, user_email: str):
             "confidence": conf
         })
 
-    # Email Alert Logic (Rate Limited)
+    # Email Alert Logic (Rate Limited per user and camera, see rate_limit.py)
     mail_sent = False
-    current_time = time.time()
-    time_diff = current_time - last_email_time
+    threat = send_alerts and (poacher_detected or weapon_detected)
+    allowed = threat and get_alert_limiter().allow(user_email, camera_id)
     
-    print(f"DEBUG: Email Check - User: {user_email}, Poacher: {poacher_detected}, Weapon: {weapon_detected}, TimeDiff: {time_diff}, Cooldown: {EMAIL_COOLDOWN}")
+    print(f"DEBUG: Email Check - User: {user_email}, Camera: {camera_id}, Poacher: {poacher_detected}, Weapon: {weapon_detected}, Allowed: {allowed}")
 
-    if (poacher_detected or weapon_detected) and (time_diff > EMAIL_COOLDOWN):
+    annotated = False
+    if allowed:
         print("DEBUG: Condition met! Attempting to send email...")
-        temp_path = "temp_alert_frame.jpg"
-        cv2.imwrite(temp_path, frame)
+        draw_live_boxes(frame, drawn)
+        annotated = True
+        # Queue the encoded frame itself; a shared temp file would be overwritten by the next alert
+        alert_image = cv2.imencode('.jpg', frame)[1].tobytes()
         subject = "EcoEye Alert: Poacher/Weapon Detected (Live)"
         
-        # Get Real Location (IP-based)
-        try:
-            import requests
-            # Short timeout to not block processing
-            response = requests.get("https://ipinfo.io/json", timeout=2)
-            data = response.json()
-            loc = data.get("loc", "").split(",")
-            if len(loc) == 2:
-                lat, lng = loc[0], loc[1]
-            else:
-                raise Exception("Invalid location data")
-        except Exception as e:
-            print(f"Warning: Could not get real location ({e}). Using default.")
-            lat, lng = "17.3850", "78.4867" # Default
-        
-        maps_link = f"https://www.google.com/maps/search/?api=1&query={lat},{lng}"
+        # Camera/user coordinates or the cached server location; never a network call here
+        maps_link = get_location_provider().maps_link(camera_id, user_email)
         
         body = f"Alert! Detection in live feed.\nPoacher: {poacher_detected}\nWeapon: {weapon_detected}"
         
@@ -363,25 +767,37 @@ def process_frame(image_bytes, user_email: str):
 
         if recipient:
             print(f"Sending email to {recipient} with location: {maps_link}")
-            success = send_alert_email(temp_path, recipient, subject, body, location_link=maps_link)
-            if success:
-                print("DEBUG: Email sent successfully!")
-                last_email_time = current_time
+            # Delivered in the background by the alert dispatcher (mailer.py)
+            if queue_alert_email(recipient, alert_image, subject, body, location_link=maps_link):
+                print("DEBUG: Email queued")
                 mail_sent = True
             else:
-                print("DEBUG: Email sending FAILED.")
+                print("DEBUG: Email could not be queued.")
         else:
             print("Error: No valid recipient email found.")
+        if not mail_sent:
+            # Nothing was sent, so don't hold the key's cooldown against the next alert
+            get_alert_limiter().refund(user_email, camera_id)
     else:
-        print("DEBUG: Email condition NOT met (Cooldown or No Detection)")
+        print("DEBUG: Email condition NOT met (Rate limited or No Detection)")
 
-    # Encode frame to base64
-    _, buffer = cv2.imencode('.jpg', frame)
-    jpg_as_text = base64.b64encode(buffer).decode('utf-8')
+    image = None
+    jpeg = None
+    if response_mode != "detections":
+        if not annotated:
+            draw_live_boxes(frame, drawn)
+        _, buffer = cv2.imencode('.jpg', frame)
+        if response_mode == "base64":
+            # Encode frame to base64
+            jpg_as_text = base64.b64encode(buffer).decode('utf-8')
+            image = f"data:image/jpeg;base64,{jpg_as_text}"
+        else:
+            jpeg = buffer.tobytes()
 
-    return {
+    result = {
         "status": "completed",
-        "image": f"data:image/jpeg;base64,{jpg_as_text}",
+        "mode": response_mode,
+        "image": image,
         "detections": detections,
         "summary": {
             "poacher": { "detected": poacher_detected, "confidence": max_poacher_conf },
@@ -390,3 +806,6 @@ def process_frame(image_bytes, user_email: str):
             "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         }
     }
+    if jpeg is not None:
+        result["jpeg"] = jpeg # Raw bytes: not JSON, the caller sends it separately
+    return result
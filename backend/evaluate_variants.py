@@ -0,0 +1,63 @@
+import os
+import argparse
+from backends import BACKENDS, load_backend
+from detector import find_model_path
+
+# Accuracy / latency report for deployment variants.
+# Runs each backend x image size (x INT8, where exported) against the
+# data.yaml validation split and prints mAP next to ms/frame, so operators can
+# pick the cheapest INFERENCE_BACKEND / INFERENCE_IMGSZ / INFERENCE_INT8 that
+# still catches poachers and weapons.
+#
+#   python evaluate_variants.py --backends torch,onnx --imgsz 320,480,640 --int8
+
+DATA_YAML = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data.yaml")
+
+def class_ap50(metrics, wanted):
+    # AP50 for the first class whose name contains `wanted` (e.g. "poacher")
+    for i, class_index in enumerate(metrics.box.ap_class_index):
+        if wanted in str(metrics.names[int(class_index)]).lower():
+            return float(metrics.box.ap50[i])
+    return None
+
+def evaluate(backend_name, weights, imgsz, int8, data=DATA_YAML):
+    backend = load_backend(backend_name, weights, imgsz=imgsz, int8=int8)
+    metrics = backend.model.val(data=data, imgsz=imgsz, batch=1, split="val", plots=False, verbose=False)
+    speed = metrics.speed
+    return {
+        "map50": float(metrics.box.map50),
+        "map": float(metrics.box.map),
+        "poacher_ap50": class_ap50(metrics, "poacher"),
+        "weapon_ap50": class_ap50(metrics, "weapon"),
+        "ms_per_frame": speed["preprocess"] + speed["inference"] + speed["postprocess"],
+    }
+
+def fmt(value):
+    return f"{value:.3f}" if value is not None else "  -  "
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Report mAP and ms/frame for each inference variant")
+    parser.add_argument("--backends", default="torch,onnx", help=f"Comma-separated, from: {', '.join(BACKENDS)}")
+    parser.add_argument("--imgsz", default="320,480,640", help="Comma-separated image sizes")
+    parser.add_argument("--int8", action="store_true", help="Also evaluate the INT8 exports")
+    parser.add_argument("--weights", default=None, help="Defaults to the latest runs/detect/train*/weights/last.pt")
+    parser.add_argument("--data", default=DATA_YAML)
+    args = parser.parse_args()
+
+    weights = args.weights or find_model_path()
+    rows = []
+    for backend_name in args.backends.split(","):
+        for int8 in ([False, True] if args.int8 else [False]):
+            if int8 and backend_name == "torch":
+                continue
+            for imgsz in [int(size) for size in args.imgsz.split(",")]:
+                variant = f"{backend_name}{'-int8' if int8 else ''} @{imgsz}"
+                try:
+                    rows.append((variant, evaluate(backend_name, weights, imgsz, int8, args.data)))
+                except Exception as e:
+                    print(f"Skipping {variant}: {e}")
+
+    print(f"\n{'variant':<22}{'mAP50':>8}{'mAP50-95':>10}{'poacher':>9}{'weapon':>8}{'ms/frame':>10}")
+    for variant, result in sorted(rows, key=lambda row: row[1]["ms_per_frame"]):
+        print(f"{variant:<22}{fmt(result['map50']):>8}{fmt(result['map']):>10}"
+              f"{fmt(result['poacher_ap50']):>9}{fmt(result['weapon_ap50']):>8}{result['ms_per_frame']:>10.1f}")
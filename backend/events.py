@@ -0,0 +1,60 @@
+import time
+import asyncio
+import threading
+
+# In-memory job event log for server-push status (SSE).
+#
+# Producers (the job manager and its listener thread for worker-process
+# events) call publish() from any thread; async consumers wait on
+# wait_for_events() with a cursor, the id of the last event they saw, so a
+# reconnecting client resumes exactly where it left off. Consecutive progress
+# events for a job are coalesced, so the log stays small however long the
+# job runs.
+
+class JobEvents:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._events = {} # job_id -> [event, ...]
+        self._seq = 0
+        self._waiters = set() # (loop, asyncio.Event)
+
+    def publish(self, job_id, event, data):
+        with self._lock:
+            self._seq += 1
+            entry = {"id": self._seq, "event": event, "data": data, "time": time.time()}
+            log = self._events.setdefault(job_id, [])
+            if event == "progress" and log and log[-1]["event"] == "progress":
+                log[-1] = entry
+            else:
+                log.append(entry)
+            waiters = list(self._waiters)
+
+        for loop, ready in waiters:
+            loop.call_soon_threadsafe(ready.set)
+
+    def since(self, job_id, cursor=0):
+        with self._lock:
+            return [entry for entry in self._events.get(job_id, []) if entry["id"] > cursor]
+
+    def discard(self, job_id):
+        with self._lock:
+            self._events.pop(job_id, None)
+
+    async def wait_for_events(self, job_id, cursor=0, timeout=15.0):
+        # Register before checking so an event published in between still wakes us
+        ready = asyncio.Event()
+        waiter = (asyncio.get_running_loop(), ready)
+        with self._lock:
+            self._waiters.add(waiter)
+        try:
+            new_events = self.since(job_id, cursor)
+            if new_events:
+                return new_events
+            try:
+                await asyncio.wait_for(ready.wait(), timeout)
+            except asyncio.TimeoutError:
+                return []
+            return self.since(job_id, cursor)
+        finally:
+            with self._lock:
+                self._waiters.discard(waiter)
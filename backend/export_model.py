@@ -0,0 +1,58 @@
+import os
+import argparse
+from ultralytics import YOLO
+from backends import exported_path
+from detector import find_model_path
+
+# Export the latest trained weights (runs/detect/train*/weights/last.pt) for the
+# CPU-optimised backends. The exported model is written next to the .pt file,
+# where backends.py looks for it.
+#
+#   python export_model.py --format onnx
+#   python export_model.py --format openvino   (needs: pip install openvino)
+#   python export_model.py --format onnx --int8   (INT8-quantized variant)
+
+DATA_YAML = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data.yaml")
+
+def export(weights_path, fmt, imgsz=640, int8=False):
+    print(f"Exporting {weights_path} to {fmt} (imgsz={imgsz}, int8={int8})...")
+    model = YOLO(weights_path)
+    if fmt == "onnx":
+        # dynamic batch so batched video inference stays a single session run
+        output = model.export(format="onnx", imgsz=imgsz, dynamic=True)
+        if int8:
+            output = quantize_onnx(output, exported_path(weights_path, "onnx", int8=True))
+    else:
+        # OpenVINO calibrates INT8 on the data.yaml images
+        output = model.export(format="openvino", imgsz=imgsz, int8=int8, data=DATA_YAML if int8 else None)
+    print(f"Exported: {output}")
+    return output
+
+def quantize_onnx(fp32_path, int8_path):
+    # Dynamic INT8 quantization (weights INT8, activations quantized at run time)
+    import onnx
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    quantize_dynamic(fp32_path, int8_path, weight_type=QuantType.QUInt8)
+
+    # Keep the class names / stride metadata ultralytics reads back at load time
+    source = onnx.load(fp32_path)
+    quantized = onnx.load(int8_path)
+    del quantized.metadata_props[:]
+    quantized.metadata_props.extend(source.metadata_props)
+    onnx.save(quantized, int8_path)
+    return int8_path
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Export trained weights for the ONNX Runtime / OpenVINO backends")
+    parser.add_argument("--format", choices=["onnx", "openvino", "all"], default="onnx")
+    parser.add_argument("--weights", default=None, help="Defaults to the latest runs/detect/train*/weights/last.pt")
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--int8", action="store_true", help="Write the INT8-quantized variant (onnx keeps the FP32 export too)")
+    args = parser.parse_args()
+
+    weights = args.weights or find_model_path()
+    formats = ["onnx", "openvino"] if args.format == "all" else [args.format]
+    for fmt in formats:
+        export(weights, fmt, args.imgsz, args.int8)
+        print(f"Set INFERENCE_BACKEND={fmt}{' INFERENCE_INT8=1' if args.int8 else ''} to serve {exported_path(weights, fmt, args.int8)}")
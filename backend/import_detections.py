@@ -0,0 +1,58 @@
+import os
+import glob
+import json
+import asyncio
+import argparse
+from database import db
+from detection_store import ensure_indexes, store_result
+
+# One-off backfill of the detection store from existing processed_*.json files.
+# Older result files don't record who uploaded them, so they are all assigned
+# to --user. Safe to re-run: each file replaces its own earlier import.
+#
+#   python import_detections.py --user ranger@example.com [--uploads ../uploads]
+
+UPLOAD_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "uploads")
+
+def result_files(upload_dir):
+    for path in sorted(glob.glob(os.path.join(upload_dir, "processed_*.json"))):
+        if path.endswith(".progress.json"):
+            continue
+        yield path
+
+def original_filename(upload_dir, json_path, result):
+    # processed_<name>.json -> <name><ext>, using the upload still on disk when there is one
+    base = os.path.basename(json_path)[len("processed_"):-len(".json")]
+    matches = [os.path.basename(p) for p in glob.glob(os.path.join(upload_dir, glob.escape(base) + ".*"))
+               if not p.endswith((".json", ".jsonl"))]
+    if matches:
+        return matches[0]
+    video_url = result.get("video_url") or ""
+    return base + os.path.splitext(video_url)[1]
+
+async def main(user, upload_dir):
+    await ensure_indexes(db)
+    files = results = detections = 0
+    for json_path in result_files(upload_dir):
+        files += 1
+        try:
+            with open(json_path, "r") as f:
+                result = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Skipping {json_path}: {e}")
+            continue
+        if result.get("status") != "completed":
+            continue
+        filename = original_filename(upload_dir, json_path, result)
+        stored = await store_result(db, user, filename, result, sidecar_json_path=json_path)
+        results += 1
+        detections += stored
+        print(f"{filename}: {stored} detections")
+    print(f"\nImported {results} results ({detections} detections) from {files} files in {upload_dir}")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Backfill MongoDB detections from processed_*.json files")
+    parser.add_argument("--user", required=True, help="Username the imported results belong to")
+    parser.add_argument("--uploads", default=UPLOAD_DIR)
+    args = parser.parse_args()
+    asyncio.run(main(args.user, args.uploads))
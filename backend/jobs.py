@@ -0,0 +1,234 @@
+import os
+import time
+import uuid
+import threading
+import collections
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from events import JobEvents
+
+# Video/image jobs run in a pool of worker processes, each with its own copy
+# of the model, so inference never competes with the API for the web
+# server's cores. Jobs wait in a bounded queue; when it is full new uploads
+# are rejected instead of piling up.
+
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", "1"))
+JOB_QUEUE_SIZE = int(os.getenv("JOB_QUEUE_SIZE", "20"))
+JOB_HISTORY = 500 # Finished jobs kept in memory for status lookups
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+class QueueFullError(Exception):
+    pass
+
+def _init_worker(event_queue):
+    # Load and warm this worker's own copy of the model before taking jobs
+    import detector
+    detector.set_event_sink(event_queue)
+    detector.warmup()
+    print(f"DEBUG: Inference worker {os.getpid()} ready", flush=True)
+
+def _run_job(video_path, user_email, job_id, camera_id=None):
+    import detector
+    return detector.process_video(video_path, user_email, job_id=job_id, camera_id=camera_id)
+
+class JobManager:
+    def __init__(self, workers=INFERENCE_WORKERS, queue_size=JOB_QUEUE_SIZE, on_finished=None, on_result=None):
+        self.workers = max(1, workers)
+        self.queue_size = queue_size
+        self._jobs = collections.OrderedDict()
+        self._pending = collections.deque()
+        self._running = 0
+        self._lock = threading.RLock()
+        self._executor = None
+        self._context = multiprocessing.get_context("spawn")
+        self._event_queue = None
+        self.events = JobEvents()
+        self.on_finished = on_finished # Called as on_finished(job, result) from the pool's callback thread
+        self.on_result = on_result # result = on_result(job, result) for a finished job, before it is published
+
+    def start(self):
+        if self._event_queue is None:
+            # Workers push progress events here; a listener thread republishes them
+            self._event_queue = self._context.Queue()
+            threading.Thread(target=self._forward_events, name="job-events", daemon=True).start()
+
+        # spawn (not fork) so workers don't inherit the server's event loop and sockets
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=self._context,
+            initializer=_init_worker,
+            initargs=(self._event_queue,),
+        )
+        print(f"DEBUG: Job manager started with {self.workers} worker(s), queue size {self.queue_size}", flush=True)
+
+    def shutdown(self):
+        if self._executor:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def is_full(self):
+        with self._lock:
+            return len(self._pending) >= self.queue_size
+
+    def submit(self, video_path, user_email, filename, camera_id=None, content_hash=None, model_version=None):
+        with self._lock:
+            if len(self._pending) >= self.queue_size:
+                raise QueueFullError(f"Job queue is full ({self.queue_size} waiting)")
+
+            job_id = uuid.uuid4().hex
+            self._jobs[job_id] = {
+                "job_id": job_id,
+                "filename": filename,
+                "video_path": video_path,
+                "user": user_email,
+                "users": [user_email], # Everyone waiting on this job (duplicate uploads join it)
+                "camera_id": camera_id,
+                "content_hash": content_hash,
+                "model_version": model_version,
+                "state": QUEUED,
+                "submitted_at": time.time(),
+                "started_at": None,
+                "finished_at": None,
+                "error": None,
+            }
+            self._pending.append(job_id)
+            self._publish_state(job_id)
+            self._dispatch()
+            return self.get(job_id)
+
+    def find_active(self, video_path, model_version=None):
+        # A queued or running job for the same stored file and model, if any
+        with self._lock:
+            for job_id, job in self._jobs.items():
+                if (job["video_path"] == video_path and job["model_version"] == model_version
+                        and job["state"] in (QUEUED, RUNNING)):
+                    return job_id
+            return None
+
+    def join(self, job_id, user_email):
+        # Let another user follow an in-flight job instead of starting a duplicate
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job["state"] not in (QUEUED, RUNNING):
+                return None
+            if user_email not in job["users"]:
+                job["users"].append(user_email)
+            return self.get(job_id)
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            info = {k: v for k, v in job.items() if k != "video_path"}
+            info["users"] = list(job["users"])
+            info["queue_position"] = self._pending.index(job_id) + 1 if job["state"] == QUEUED else 0
+            return info
+
+    def stats(self):
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "running": self._running,
+                "queued": len(self._pending),
+                "queue_size": self.queue_size,
+            }
+
+    def _dispatch(self):
+        # Hand queued jobs to the pool only while a worker is free, so the
+        # pool never holds a hidden backlog of its own
+        while self._pending and self._running < self.workers:
+            job_id = self._pending.popleft()
+            job = self._jobs[job_id]
+            job["state"] = RUNNING
+            job["started_at"] = time.time()
+            self._running += 1
+            self._publish_state(job_id)
+            try:
+                future = self._executor.submit(_run_job, job["video_path"], job["user"], job_id, job["camera_id"])
+            except BrokenProcessPool:
+                self._restart(self._executor)
+                future = self._executor.submit(_run_job, job["video_path"], job["user"], job_id, job["camera_id"])
+            pool = self._executor
+            future.add_done_callback(lambda f, job_id=job_id, pool=pool: self._on_done(job_id, f, pool))
+
+    def _restart(self, broken_pool):
+        # A worker died (e.g. OOM kill); every job on that pool fails, but only
+        # the first report replaces it
+        if broken_pool is self._executor:
+            print("ERROR: Inference pool broken, restarting it", flush=True)
+            broken_pool.shutdown(wait=False, cancel_futures=True)
+            self.start()
+
+    def _on_done(self, job_id, future, pool):
+        with self._lock:
+            self._running -= 1
+            job = self._jobs[job_id]
+            job["finished_at"] = time.time()
+            result = None
+            try:
+                result = future.result()
+                if result and result.get("status") == "error":
+                    job["state"] = FAILED
+                    job["error"] = result.get("message")
+                else:
+                    job["state"] = DONE
+            except Exception as e:
+                print(f"ERROR: Job {job_id} crashed: {e}", flush=True)
+                job["state"] = FAILED
+                job["error"] = str(e)
+                if isinstance(e, BrokenProcessPool):
+                    self._restart(pool)
+            finished = dict(job, users=list(job["users"]))
+            self._dispatch()
+        
+        # Outside the lock, as the hook may queue alerts; the job is no longer
+        # joinable, so its user list can't change underneath it
+        if self.on_result and finished["state"] == DONE:
+            try:
+                result = self.on_result(finished, result)
+            except Exception as e:
+                print(f"ERROR: Job {job_id} result hook: {e}", flush=True)
+        
+        with self._lock:
+            self._publish_state(job_id, result)
+            self._prune()
+        
+        if self.on_finished and finished["state"] == DONE:
+            try:
+                self.on_finished(finished, result)
+            except Exception as e:
+                print(f"ERROR: Job {job_id} finish hook: {e}", flush=True)
+
+    def _publish_state(self, job_id, result=None):
+        data = self.get(job_id)
+        if result is not None:
+            data["result"] = result
+        self.events.publish(job_id, "state", data)
+        # Queue positions shift for everyone behind a job that starts
+        if data["state"] == RUNNING:
+            for queued_id in self._pending:
+                self.events.publish(queued_id, "state", self.get(queued_id))
+
+    def _forward_events(self):
+        while True:
+            try:
+                job_id, event, data = self._event_queue.get()
+                with self._lock:
+                    job = self._jobs.get(job_id)
+                    # Late progress from a job that already reported its final state
+                    if job is None or job["state"] in (DONE, FAILED):
+                        continue
+                self.events.publish(job_id, event, data)
+            except Exception as e:
+                print(f"ERROR: Job event listener: {e}", flush=True)
+
+    def _prune(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job["state"] in (DONE, FAILED)]
+        for job_id in finished[:max(0, len(finished) - JOB_HISTORY)]:
+            del self._jobs[job_id]
+            self.events.discard(job_id)
@@ -0,0 +1,81 @@
+import time
+import asyncio
+import collections
+
+# Helpers for the live detection socket (/ws/detect).
+#
+# Each connection keeps only the newest frame the client has sent
+# (latest-frame-wins): if the client sends faster than we can infer, older
+# pending frames are dropped instead of queueing up and adding latency.
+
+STATS_WINDOW = 5.0 # Seconds of history used for the fps figures
+
+class LatestFrameSlot:
+    def __init__(self):
+        self._frame = None
+        self._received_at = None
+        self._ready = asyncio.Event()
+        self.closed = False
+
+    def put(self, data):
+        # Returns True when an older, never-inferred frame was replaced
+        dropped = self._frame is not None
+        self._frame = data
+        self._received_at = time.monotonic()
+        self._ready.set()
+        return dropped
+
+    def close(self):
+        self.closed = True
+        self._ready.set()
+
+    async def get(self):
+        # Waits for the next frame; returns (None, None) once the slot is closed.
+        # A frame still pending at close() is dropped: its client is gone.
+        await self._ready.wait()
+        if self.closed:
+            return None, None
+        self._ready.clear()
+        frame, received_at = self._frame, self._received_at
+        self._frame = None
+        return frame, received_at
+
+class LiveStats:
+    def __init__(self):
+        self.received = collections.deque()
+        self.inferred = collections.deque()
+        self.dropped = collections.deque()
+        self.latencies = collections.deque()
+        self.totals = {"received": 0, "inferred": 0, "dropped": 0}
+
+    def record_received(self):
+        self._add("received", self.received)
+
+    def record_dropped(self):
+        self._add("dropped", self.dropped)
+
+    def record_inferred(self, latency):
+        self._add("inferred", self.inferred)
+        self.latencies.append((time.monotonic(), latency))
+
+    def _add(self, name, events):
+        self.totals[name] += 1
+        events.append(time.monotonic())
+
+    def snapshot(self):
+        now = time.monotonic()
+        for events in (self.received, self.inferred, self.dropped):
+            while events and now - events[0] > STATS_WINDOW:
+                events.popleft()
+        while self.latencies and now - self.latencies[0][0] > STATS_WINDOW:
+            self.latencies.popleft()
+
+        latencies = sorted(latency for _, latency in self.latencies)
+        return {
+            "received_fps": round(len(self.received) / STATS_WINDOW, 2),
+            "inferred_fps": round(len(self.inferred) / STATS_WINDOW, 2),
+            "dropped_fps": round(len(self.dropped) / STATS_WINDOW, 2),
+            "latency_ms": round(latencies[len(latencies) // 2] * 1000, 1) if latencies else None,
+            "latency_p95_ms": round(latencies[int(len(latencies) * 0.95)] * 1000, 1) if latencies else None,
+            "totals": dict(self.totals),
+        }
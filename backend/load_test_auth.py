@@ -0,0 +1,101 @@
+import sys
+import time
+import asyncio
+import argparse
+import cv2
+import httpx
+import numpy as np
+
+# Usage: python load_test_auth.py --user ranger@example.com --password secret [--image frame.jpg]
+#                                 [--url http://localhost:8000] [--concurrency 20] [--requests 200]
+# Latency under concurrency for the two authenticated hot paths:
+#   login   /auth/login (bcrypt on the hash executor)
+#   frame   /detect_frame?mode=detections (cached user lookup + live inference)
+#   mixed   both at once, to show logins no longer stall the frames
+# Prints p50/p95/p99/max per endpoint, then the server's user cache counters.
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return float("nan")
+    index = min(len(sorted_values) - 1, int(round(p / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+def report(name, latencies, errors, elapsed):
+    latencies = sorted(latencies)
+    ms = lambda p: percentile(latencies, p) * 1000
+    rate = len(latencies) / elapsed if elapsed > 0 else 0.0
+    print(f"{name:<14} n={len(latencies):<5} err={errors:<4} {rate:7.1f} req/s  "
+          f"p50={ms(50):7.1f}  p95={ms(95):7.1f}  p99={ms(99):7.1f}  max={ms(100):7.1f} ms")
+
+async def run(client, name, make_request, total, concurrency):
+    latencies = []
+    errors = 0
+    remaining = total
+
+    async def worker():
+        nonlocal remaining, errors
+        while remaining > 0:
+            remaining -= 1
+            start = time.perf_counter()
+            try:
+                response = await make_request(client)
+                if response.status_code != 200:
+                    errors += 1
+                    continue
+            except httpx.HTTPError:
+                errors += 1
+                continue
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return name, latencies, errors, time.perf_counter() - start
+
+async def main(args):
+    if args.image:
+        frame = cv2.imread(args.image)
+        if frame is None:
+            print(f"Error: could not read {args.image}")
+            sys.exit(1)
+    else:
+        frame = np.random.randint(0, 255, (480, 640, 3), dtype=np.uint8)
+    jpeg = cv2.imencode('.jpg', frame)[1].tobytes()
+
+    login_form = {"username": args.user, "password": args.password}
+    limits = httpx.Limits(max_connections=args.concurrency * 2)
+    async with httpx.AsyncClient(base_url=args.url, timeout=60, limits=limits) as client:
+        response = await client.post("/auth/login", data=login_form)
+        if response.status_code != 200:
+            print(f"Error: login failed ({response.status_code}): {response.text}")
+            sys.exit(1)
+        headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+        login = lambda c: c.post("/auth/login", data=login_form)
+        frame_request = lambda c: c.post("/detect_frame", params={"mode": "detections"}, headers=headers,
+                                         files={"file": ("frame.jpg", jpeg, "image/jpeg")})
+
+        # Warm the model and the user cache
+        await frame_request(client)
+
+        print(f"{args.requests} requests per endpoint, concurrency {args.concurrency}, against {args.url}\n")
+        report(*await run(client, "login", login, args.requests, args.concurrency))
+        report(*await run(client, "frame", frame_request, args.requests, args.concurrency))
+        for result in await asyncio.gather(
+            run(client, "mixed login", login, args.requests, args.concurrency // 2 or 1),
+            run(client, "mixed frame", frame_request, args.requests, args.concurrency // 2 or 1),
+        ):
+            report(*result)
+
+        metrics = await client.get("/metrics/auth")
+        if metrics.status_code == 200:
+            print(f"\nUser cache: {metrics.json()}")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="p99 latency of /detect_frame and /auth/login under concurrency")
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--user", required=True)
+    parser.add_argument("--password", required=True)
+    parser.add_argument("--image", help="JPEG/PNG sent to /detect_frame (default: random noise)")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--requests", type=int, default=200)
+    asyncio.run(main(parser.parse_args()))
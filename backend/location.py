@@ -0,0 +1,141 @@
+import os
+import json
+import time
+import threading
+import requests
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Where an alert happened, without ever blocking detection on the network.
+#
+# Lookup order for get_location(camera_id, user):
+#   1. coordinates configured for the camera, then for the user (LOCATIONS_FILE)
+#   2. the server's IP geolocation, cached for LOCATION_TTL seconds
+#   3. DEFAULT_LOCATION
+# The IP lookup only ever runs on a background thread: a stale or missing
+# cache entry schedules a refresh and the caller gets the best value we
+# already have.
+#
+# LOCATIONS_FILE looks like:
+#   {"cameras": {"gate-north": {"lat": 17.41, "lng": 78.47}},
+#    "users": {"ranger@example.com": {"lat": 17.38, "lng": 78.48}}}
+
+LOCATIONS_FILE = os.getenv("LOCATIONS_FILE", os.path.join(os.path.dirname(os.path.abspath(__file__)), "locations.json"))
+LOCATION_TTL = float(os.getenv("LOCATION_TTL", "3600"))
+LOCATION_LOOKUP_URL = os.getenv("LOCATION_LOOKUP_URL", "https://ipinfo.io/json")
+LOCATION_RETRY = float(os.getenv("LOCATION_RETRY", "60")) # Wait this long after a failed lookup
+DEFAULT_LOCATION = os.getenv("DEFAULT_LOCATION", "17.3850,78.4867") # Hyderabad
+
+def _parse(value):
+    # "lat,lng" string, [lat, lng] list or {"lat": .., "lng": ..} dict -> (lat, lng) strings
+    if isinstance(value, dict):
+        value = (value.get("lat"), value.get("lng"))
+    elif isinstance(value, str):
+        value = value.split(",")
+    if value is None or len(value) != 2:
+        return None
+    try:
+        return tuple(str(float(part)) for part in value)
+    except (TypeError, ValueError):
+        return None
+
+class LocationProvider:
+    def __init__(self, locations_file=LOCATIONS_FILE, ttl=LOCATION_TTL, lookup_url=LOCATION_LOOKUP_URL, default=DEFAULT_LOCATION):
+        self.locations_file = locations_file
+        self.ttl = ttl
+        self.lookup_url = lookup_url
+        self.default = _parse(default)
+        self._lock = threading.Lock()
+        self._cached = None # (lat, lng) from the last successful IP lookup
+        self._fetched_at = 0.0
+        self._refreshing = False
+        self._attempted_at = 0.0
+        self._configured = {"cameras": {}, "users": {}}
+        self._file_mtime = None
+
+    def get_location(self, camera_id=None, user=None):
+        # Returns ((lat, lng), source) immediately; source is camera/user/ip/default
+        configured = self._configured_for(camera_id, user)
+        if configured:
+            return configured
+
+        with self._lock:
+            cached = self._cached
+            stale = time.time() - self._fetched_at > self.ttl
+        if cached is None or stale:
+            self.refresh()
+        if cached is not None:
+            return cached, "ip"
+        return self.default, "default"
+
+    def maps_link(self, camera_id=None, user=None):
+        (lat, lng), _ = self.get_location(camera_id, user)
+        return f"https://www.google.com/maps/search/?api=1&query={lat},{lng}"
+
+    def refresh(self):
+        # Start a background IP lookup unless one is already running
+        with self._lock:
+            if self._refreshing or time.time() - self._attempted_at < LOCATION_RETRY:
+                return
+            self._refreshing = True
+            self._attempted_at = time.time()
+        threading.Thread(target=self._refresh, name="location-refresh", daemon=True).start()
+
+    def _refresh(self):
+        try:
+            response = requests.get(self.lookup_url, timeout=5)
+            location = _parse(response.json().get("loc", ""))
+            if location is None:
+                raise ValueError("Invalid location data")
+            with self._lock:
+                self._cached = location
+                self._fetched_at = time.time()
+            print(f"DEBUG: Server location refreshed: {location}", flush=True)
+        except Exception as e:
+            print(f"Warning: Could not get real location ({e}).", flush=True)
+        finally:
+            with self._lock:
+                self._refreshing = False
+
+    def _configured_for(self, camera_id, user):
+        self._load_file()
+        if camera_id and camera_id in self._configured["cameras"]:
+            return self._configured["cameras"][camera_id], "camera"
+        if user and user in self._configured["users"]:
+            return self._configured["users"][user], "user"
+        return None
+
+    def _load_file(self):
+        # Re-read only when the file changes, so edits apply without a restart
+        try:
+            mtime = os.path.getmtime(self.locations_file)
+        except OSError:
+            return
+        if mtime == self._file_mtime:
+            return
+        try:
+            with open(self.locations_file, "r") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Warning: Could not read {self.locations_file} ({e})", flush=True)
+            return
+        configured = {"cameras": {}, "users": {}}
+        for section in configured:
+            for key, value in (data.get(section) or {}).items():
+                location = _parse(value)
+                if location:
+                    configured[section][key] = location
+        self._configured = configured
+        self._file_mtime = mtime
+
+_provider = None
+_provider_lock = threading.Lock()
+
+def get_location_provider():
+    global _provider
+    if _provider is None:
+        with _provider_lock:
+            if _provider is None:
+                _provider = LocationProvider()
+    return _provider
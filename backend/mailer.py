@@ -3,60 +3,265 @@ from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from email.mime.image import MIMEImage
 import os
+import time
+import queue
+import threading
 from dotenv import load_dotenv
 
 load_dotenv()
 
-def send_alert_email(image_path: str, recipient_email: str, subject: str = "URGENT: Poacher Detected - EcoEye AI", body: str = None, location_link: str = None):
+# SMTP server (defaults to Gmail). Point these at smtp_debug_server.py to test
+# alerts locally: SMTP_HOST=localhost SMTP_PORT=1025 SMTP_STARTTLS=0
+SMTP_HOST = os.getenv("SMTP_HOST", "smtp.gmail.com")
+SMTP_PORT = int(os.getenv("SMTP_PORT", "587"))
+SMTP_STARTTLS = os.getenv("SMTP_STARTTLS", "1") == "1"
+SMTP_AUTH = os.getenv("SMTP_AUTH", "1") == "1"
+SMTP_TIMEOUT = float(os.getenv("SMTP_TIMEOUT", "20"))
+SMTP_IDLE_CLOSE = float(os.getenv("SMTP_IDLE_CLOSE", "60")) # Close the pooled connection after this long unused
+
+# Alert dispatcher (see AlertDispatcher below)
+ALERT_QUEUE_SIZE = int(os.getenv("ALERT_QUEUE_SIZE", "100"))
+ALERT_MAX_RETRIES = int(os.getenv("ALERT_MAX_RETRIES", "4"))
+ALERT_RETRY_BASE = float(os.getenv("ALERT_RETRY_BASE", "2")) # Seconds; doubles on each retry
+ALERT_DIGEST_WINDOW = float(os.getenv("ALERT_DIGEST_WINDOW", "5")) # Alerts arriving this close together share one email
+ALERT_DIGEST_MAX_IMAGES = int(os.getenv("ALERT_DIGEST_MAX_IMAGES", "5"))
+
+DEFAULT_SUBJECT = "URGENT: Poacher Detected - EcoEye AI"
+DEFAULT_BODY = "⚠️ A potential poacher has been detected by the EcoEye AI system.\n\nPlease review the attached image immediately."
+
+def get_credentials():
     # Try both naming conventions
     sender_email = os.getenv("EMAIL_SENDER") or os.getenv("MAIL_USERNAME")
     sender_password = os.getenv("EMAIL_PASSWORD") or os.getenv("MAIL_PASSWORD")
+    return sender_email, sender_password
 
-    print(f"DEBUG: Sender: {sender_email[:3]}***@{sender_email.split('@')[-1]}")
-    print(f"DEBUG: Recipient: {recipient_email}")
-    
-    if not sender_email or not sender_password:
-        print("Error: Email credentials not found in environment variables.")
-        return False
+def has_credentials():
+    sender_email, sender_password = get_credentials()
+    return bool(sender_email) and (not SMTP_AUTH or bool(sender_password))
 
-    print(f"DEBUG: Connecting to SMTP server...")
-    
-    try:
-        msg = MIMEMultipart()
-        msg['Subject'] = subject
-        msg['From'] = sender_email
-        msg['To'] = recipient_email
+def connect_smtp(sender_email, sender_password):
+    server = smtplib.SMTP(SMTP_HOST, SMTP_PORT, timeout=SMTP_TIMEOUT)
+    if SMTP_STARTTLS:
+        server.starttls()
+    if SMTP_AUTH:
+        server.login(sender_email, sender_password)
+    return server
+
+def attach_image(msg, img_data, name):
+    # Determine subtype from the data, default to jpeg
+    import imghdr
+    subtype = imghdr.what(None, img_data) or 'jpeg'
+    msg.attach(MIMEImage(img_data, name=name, _subtype=subtype))
+
+def build_message(sender_email, recipient_email, subject, body=None, location_link=None, images=()):
+    # images: [(name, bytes), ...]
+    msg = MIMEMultipart()
+    msg['Subject'] = subject
+    msg['From'] = sender_email
+    msg['To'] = recipient_email
 
-        if body is None:
-            body = "⚠️ A potential poacher has been detected by the EcoEye AI system.\n\nPlease review the attached image immediately."
+    if body is None:
+        body = DEFAULT_BODY
 
-        if location_link:
-            body += f"\n\n📍 Incident Location: {location_link}"
-            body += "\n(Click to view on Google Maps)"
+    if location_link:
+        body += f"\n\n📍 Incident Location: {location_link}"
+        body += "\n(Click to view on Google Maps)"
 
-        text = MIMEText(body)
-        msg.attach(text)
+    msg.attach(MIMEText(body))
+    for name, img_data in images:
+        attach_image(msg, img_data, name)
+    return msg
 
+def send_alert_email(image_path: str, recipient_email: str, subject: str = DEFAULT_SUBJECT, body: str = None, location_link: str = None):
+    # Synchronous one-off send (diagnostic scripts). The detection paths use
+    # queue_alert_email() instead so they never wait on SMTP.
+    sender_email, sender_password = get_credentials()
+
+    print(f"DEBUG: Recipient: {recipient_email}")
+
+    if not sender_email or (SMTP_AUTH and not sender_password):
+        print("Error: Email credentials not found in environment variables.")
+        return False
+    print(f"DEBUG: Sender: {sender_email[:3]}***@{sender_email.split('@')[-1]}")
+
+    print(f"DEBUG: Connecting to SMTP server {SMTP_HOST}:{SMTP_PORT}...")
+
+    try:
+        images = []
         if os.path.exists(image_path):
             with open(image_path, 'rb') as f:
-                img_data = f.read()
-                # Default to jpeg if guessing fails, or just let MIMEImage handle it but provide subtype if needed
-                # Better: determine subtype from extension
-                import imghdr
-                subtype = imghdr.what(None, img_data) or 'jpeg'
-                image = MIMEImage(img_data, name=os.path.basename(image_path), _subtype=subtype)
-                msg.attach(image)
+                images.append((os.path.basename(image_path), f.read()))
         else:
             print(f"Warning: Image file not found at {image_path}")
 
-        # Connect to Gmail SMTP (standard port 587)
-        with smtplib.SMTP("smtp.gmail.com", 587) as server:
-            server.starttls()
-            server.login(sender_email, sender_password)
+        msg = build_message(sender_email, recipient_email, subject, body, location_link, images)
+        with connect_smtp(sender_email, sender_password) as server:
             server.send_message(msg)
-            
+
         print("Email sent successfully!")
         return True
     except Exception as e:
         print(f"Failed to send email: {e}")
         return False
+
+class AlertDispatcher:
+    """Delivers alert emails from a background thread.
+
+    Callers enqueue and return immediately. One authenticated SMTP connection
+    is kept open and reused, failed sends are retried with exponential
+    backoff, and alerts for the same recipient that arrive within
+    ALERT_DIGEST_WINDOW of each other are folded into a single digest email.
+    """
+
+    def __init__(self, max_queue=ALERT_QUEUE_SIZE, digest_window=ALERT_DIGEST_WINDOW,
+                 max_retries=ALERT_MAX_RETRIES, retry_base=ALERT_RETRY_BASE):
+        self.digest_window = digest_window
+        self.max_retries = max_retries
+        self.retry_base = retry_base
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._server = None
+        self._last_used = 0.0
+        self._lock = threading.Lock()
+        self._stats = {"queued": 0, "dropped": 0, "sent": 0, "failed": 0, "digests": 0, "retries": 0, "connections": 0}
+        self._thread = threading.Thread(target=self._run, name="alert-dispatcher", daemon=True)
+        self._thread.start()
+
+    def enqueue(self, recipient, subject=DEFAULT_SUBJECT, body=None, location_link=None, image=None, image_name="alert.jpg"):
+        # image is the encoded JPEG bytes (never a path: temp files get overwritten).
+        # Returns False when the alert can't be sent at all, so callers can report it.
+        if not has_credentials():
+            print("Error: Email credentials not found in environment variables.", flush=True)
+            self._count("failed")
+            return False
+        alert = {
+            "recipient": recipient,
+            "subject": subject,
+            "body": body,
+            "location_link": location_link,
+            "image": image,
+            "image_name": image_name,
+            "time": time.time(),
+        }
+        try:
+            self._queue.put_nowait(alert)
+        except queue.Full:
+            print(f"Warning: Alert queue full, dropping alert for {recipient}", flush=True)
+            self._count("dropped")
+            return False
+        self._count("queued")
+        return True
+
+    def metrics(self):
+        with self._lock:
+            return dict(self._stats, pending=self._queue.qsize(), connected=self._server is not None)
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self._stats[name] += amount
+
+    def _run(self):
+        while True:
+            try:
+                alert = self._queue.get(timeout=SMTP_IDLE_CLOSE)
+            except queue.Empty:
+                self._close()
+                continue
+
+            # Fold the burst: keep collecting until the window after the first alert closes
+            batch = [alert]
+            deadline = time.monotonic() + self.digest_window
+            while True:
+                remaining = deadline - time.monotonic()
+                try:
+                    batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            by_recipient = {}
+            for alert in batch:
+                by_recipient.setdefault(alert["recipient"], []).append(alert)
+            for recipient, alerts in by_recipient.items():
+                self._deliver(recipient, alerts)
+
+    def _compose(self, sender_email, recipient, alerts):
+        first = alerts[0]
+        if len(alerts) == 1:
+            images = [(first["image_name"], first["image"])] if first["image"] else []
+            return build_message(sender_email, recipient, first["subject"], first["body"], first["location_link"], images)
+
+        lines = [f"⚠️ {len(alerts)} alerts were raised by the EcoEye AI system:", ""]
+        for alert in alerts:
+            when = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(alert["time"]))
+            lines.append(f"- {when}: {alert['subject']}")
+            if alert["location_link"]:
+                lines.append(f"  📍 {alert['location_link']}")
+        images = [(f"{i + 1}_{alert['image_name']}", alert["image"]) for i, alert in enumerate(alerts) if alert["image"]]
+        if len(images) > ALERT_DIGEST_MAX_IMAGES:
+            lines += ["", f"(Showing {ALERT_DIGEST_MAX_IMAGES} of {len(images)} images)"]
+            images = images[:ALERT_DIGEST_MAX_IMAGES]
+        return build_message(sender_email, recipient, f"URGENT: {len(alerts)} alerts - EcoEye AI", "\n".join(lines), None, images)
+
+    def _deliver(self, recipient, alerts):
+        sender_email, sender_password = get_credentials()
+        if not has_credentials():
+            print("Error: Email credentials not found in environment variables.", flush=True)
+            self._count("failed", len(alerts))
+            return
+
+        msg = self._compose(sender_email, recipient, alerts)
+        for attempt in range(self.max_retries + 1):
+            try:
+                server = self._connection(sender_email, sender_password)
+                server.send_message(msg)
+                self._last_used = time.monotonic()
+                self._count("sent", len(alerts))
+                if len(alerts) > 1:
+                    self._count("digests")
+                print(f"Alert email sent to {recipient} ({len(alerts)} alert(s))", flush=True)
+                return
+            except Exception as e:
+                # The pooled connection may have been dropped by the server: start fresh
+                self._close()
+                if attempt == self.max_retries:
+                    print(f"Failed to send alert email to {recipient}: {e}", flush=True)
+                    self._count("failed", len(alerts))
+                    return
+                delay = self.retry_base * (2 ** attempt)
+                print(f"Warning: Alert email failed ({e}), retrying in {delay:.0f}s", flush=True)
+                self._count("retries")
+                time.sleep(delay)
+
+    def _connection(self, sender_email, sender_password):
+        if self._server is not None and time.monotonic() - self._last_used > SMTP_IDLE_CLOSE:
+            self._close()
+        if self._server is None:
+            print(f"DEBUG: Connecting to SMTP server {SMTP_HOST}:{SMTP_PORT}...", flush=True)
+            self._server = connect_smtp(sender_email, sender_password)
+            self._count("connections")
+        return self._server
+
+    def _close(self):
+        if self._server is None:
+            return
+        try:
+            self._server.quit()
+        except Exception:
+            pass
+        self._server = None
+
+_dispatcher = None
+_dispatcher_lock = threading.Lock()
+
+def get_alert_dispatcher():
+    global _dispatcher
+    if _dispatcher is None:
+        with _dispatcher_lock:
+            if _dispatcher is None:
+                _dispatcher = AlertDispatcher()
+    return _dispatcher
+
+def queue_alert_email(recipient_email: str, image: bytes = None, subject: str = DEFAULT_SUBJECT, body: str = None,
+                      location_link: str = None, image_name: str = "alert.jpg"):
+    # Returns True once the alert is queued (False without credentials or when the
+    # queue is full); delivery happens in the background
+    return get_alert_dispatcher().enqueue(recipient_email, subject, body, location_link, image, image_name)
@@ -1,26 +1,89 @@
-from fastapi import FastAPI, UploadFile, File, BackgroundTasks, WebSocket, WebSocketDisconnect, Depends, HTTPException, status
+from fastapi import FastAPI, UploadFile, File, Form, Query, Request, WebSocket, WebSocketDisconnect, Depends, HTTPException, status
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse, RedirectResponse
+from fastapi.responses import FileResponse, RedirectResponse, JSONResponse, StreamingResponse, Response
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from pydantic import BaseModel, validator
 import shutil
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import os
 import time
 import json
 import detector # Import the detector module
-from database import get_database
-from auth import get_password_hash, verify_password, create_access_token, ACCESS_TOKEN_EXPIRE_MINUTES, SECRET_KEY, ALGORITHM
+from mailer import get_alert_dispatcher
+from jobs import JobManager, QueueFullError
+from progress import read_progress, read_sidecar
+from live import LatestFrameSlot, LiveStats
+from database import get_database, db as mongo_db
+import detection_store
+import analytics
+import upload_store
+from starlette.concurrency import run_in_threadpool
+from auth import get_password_hash_async, verify_password_async, hash_executor, create_access_token, ACCESS_TOKEN_EXPIRE_MINUTES, SECRET_KEY, ALGORITHM
+from user_cache import users as user_cache
 from jose import JWTError, jwt
-from datetime import timedelta
+from datetime import timedelta, datetime, timezone
+from bson.errors import InvalidId
 from dotenv import load_dotenv
 
 load_dotenv()
 
 app = FastAPI(title="Wildeye AI Backend")
 
+# Loop the API runs on; job callbacks arrive on pool threads and hop onto it
+main_loop = None
+
+def result_for_user(result, user):
+    # A job's result as one of its users sees it: with their own alert status
+    mail_sent_to = result.get("mail_sent_to")
+    if not mail_sent_to:
+        return result
+    result = {k: v for k, v in result.items() if k != "mail_sent_to"}
+    result["mail_sent"] = mail_sent_to.get(user, result.get("mail_sent"))
+    return result
+
+def alert_joined_users(job, result):
+    # Job result hook: the worker alerted the first uploader; everyone who joined
+    # the job gets their own (rate limited) alert before the result goes out
+    mail_sent_to = {job["user"]: result.get("mail_sent")}
+    video_path = os.path.join(UPLOAD_DIR, job["filename"])
+    for user in job["users"]:
+        if user not in mail_sent_to:
+            mail_sent_to[user] = detector.alert_for_result(video_path, result, user, job.get("camera_id"))
+    return dict(result, mail_sent_to=mail_sent_to)
+
+async def store_job(job, result, json_path):
+    if job.get("content_hash"):
+        await upload_store.put_cached_result(mongo_db, job["content_hash"], job["model_version"], job["filename"],
+                                             result_for_user(result, job["user"]))
+    for user in job["users"]:
+        analytics.rollups.record(user, job.get("camera_id"), detection_store.parse_timestamp(result.get("timestamp")),
+                                 analytics.result_detections(result))
+        await detection_store.store_result(mongo_db, user, job["filename"], result_for_user(result, user), job.get("camera_id"), json_path)
+
+def store_finished_job(job, result):
+    # Job done hook: write the result, its detections and rollup counts to MongoDB
+    json_path = os.path.join(UPLOAD_DIR, f"processed_{os.path.splitext(job['filename'])[0]}.json")
+    future = asyncio.run_coroutine_threadsafe(store_job(job, result, json_path), main_loop)
+    future.add_done_callback(lambda f: f.exception() and print(f"Warning: Storing job {job['job_id']} failed: {f.exception()}", flush=True))
+
+# Inference worker pool for uploaded videos/images
+job_manager = JobManager(on_finished=store_finished_job, on_result=alert_joined_users)
+
+# Live frames (/detect_frame, /ws/detect) are inferred on these threads so the
+# event loop is never blocked by a model call
+# (they mostly wait on the shared batcher, so keep this above LIVE_BATCH_SIZE)
+live_executor = ThreadPoolExecutor(max_workers=int(os.getenv("LIVE_WORKERS", "16")), thread_name_prefix="live-infer")
+
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")
 
+class UploadSessionCreate(BaseModel):
+    filename: str
+    size: int
+    camera_id: str = None
+
 class UserCreate(BaseModel):
     username: str
     password: str
@@ -40,9 +103,10 @@ async def register(user: UserCreate, db=Depends(get_database)):
             print("User already exists")
             raise HTTPException(status_code=400, detail="Username already registered")
         
-        hashed_password = get_password_hash(user.password)
+        hashed_password = await get_password_hash_async(user.password)
         user_dict = {"username": user.username, "hashed_password": hashed_password}
         result = await db.users.insert_one(user_dict)
+        user_cache.invalidate(user.username)
         print(f"User created with ID: {result.inserted_id}")
         return {"message": "User created successfully"}
     except Exception as e:
@@ -52,7 +116,7 @@ async def register(user: UserCreate, db=Depends(get_database)):
 @app.post("/auth/login")
 async def login(form_data: OAuth2PasswordRequestForm = Depends(), db=Depends(get_database)):
     user = await db.users.find_one({"username": form_data.username})
-    if not user or not verify_password(form_data.password, user["hashed_password"]):
+    if not user or not await verify_password_async(form_data.password, user["hashed_password"]):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
@@ -78,18 +142,45 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db=Depends(get_d
     except JWTError:
         raise credentials_exception
     
+    cached = user_cache.get(username)
+    if cached is not None:
+        return cached
+    
     user = await db.users.find_one({"username": username})
     if user is None:
         raise credentials_exception
     
     # Return user details
-    return {
+    profile = {
         "username": user["username"], 
         "_id": str(user["_id"]),
         "name": user.get("name", "User"),
         "picture": user.get("picture"),
         "created_at": user.get("created_at")
     }
+    user_cache.put(username, profile)
+    return profile
+
+@app.get("/ready")
+async def readiness():
+    # Load balancer readiness probe: only route traffic here once the model is warm
+    if not detector.is_ready():
+        return JSONResponse(status_code=503, content={"status": "warming_up"})
+    return {"status": "ready", "jobs": job_manager.stats()}
+
+@app.get("/metrics/live-batching")
+async def live_batching_metrics():
+    # Batch fill rate and queueing delay of the shared live-frame batcher
+    return detector.get_live_batcher().metrics()
+
+@app.get("/metrics/alerts")
+async def alert_metrics():
+    # Alert emails queued/sent/retried by this process's dispatcher (live-frame alerts)
+    return get_alert_dispatcher().metrics()
+
+@app.get("/metrics/auth")
+async def auth_metrics():
+    return user_cache.metrics()
 
 @app.get("/users/me")
 async def read_users_me(current_user: dict = Depends(get_current_user)):
@@ -97,9 +188,28 @@ async def read_users_me(current_user: dict = Depends(get_current_user)):
 
 @app.on_event("startup")
 async def startup_event():
+    global main_loop
     print(">>> BACKEND SERVER ON PORT 8000 STARTED <<<", flush=True)
+    main_loop = asyncio.get_running_loop()
+    detection_store.spawn(detection_store.ensure_indexes(mongo_db))
+    detection_store.spawn(analytics.ensure_indexes(mongo_db))
+    detection_store.spawn(analytics.run_flusher(mongo_db))
     google_redirect = os.getenv("GOOGLE_REDIRECT_URI")
     print(f"DEBUG: Startup - GOOGLE_REDIRECT_URI: {google_redirect}", flush=True)
+    job_manager.start()
+    detection_store.spawn(upload_store.run_session_sweeper(upload_sessions))
+    # Load + warm the model off the event loop; /ready reports when it's done
+    threading.Thread(target=detector.warmup, name="model-warmup", daemon=True).start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    try:
+        await analytics.rollups.flush(mongo_db)
+    except Exception as e:
+        print(f"Warning: Analytics flush failed: {e}", flush=True)
+    job_manager.shutdown()
+    live_executor.shutdown(wait=False)
+    hash_executor.shutdown(wait=False)
 
 # CORS Setup
 app.add_middleware(
@@ -113,9 +223,25 @@ app.add_middleware(
 UPLOAD_DIR = "../uploads"
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 
+# Resumable upload sessions for large files (see upload_store.py)
+upload_sessions = upload_store.UploadSessions(UPLOAD_DIR)
+
 # Serve uploaded/processed files
 app.mount("/uploads", StaticFiles(directory=UPLOAD_DIR), name="uploads")
 
+# HLS output (VIDEO_OUTPUT=hls): playlists keep growing while the job runs, so
+# they are revalidated on every request; segments never change once written
+HLS_MEDIA_TYPES = {".m3u8": "application/vnd.apple.mpegurl", ".ts": "video/mp2t"}
+
+@app.get("/hls/{name}")
+async def serve_hls(name: str):
+    ext = os.path.splitext(name)[1]
+    path = os.path.join(UPLOAD_DIR, os.path.basename(name))
+    if ext not in HLS_MEDIA_TYPES or not os.path.isfile(path):
+        raise HTTPException(status_code=404, detail="Not found")
+    cache = "no-cache" if ext == ".m3u8" else "public, max-age=86400, immutable"
+    return FileResponse(path, media_type=HLS_MEDIA_TYPES[ext], headers={"Cache-Control": cache})
+
 # Mount static files (Frontend)
 # Ensure 'frontend/dist' exists (run npm run build first)
 if os.path.exists("../frontend/dist"):
@@ -129,25 +255,182 @@ async def serve_frontend():
     return {"error": "Frontend not built. Run 'npm run build' in frontend directory."}
 
 @app.post("/upload")
-async def upload_video(file: UploadFile = File(...), background_tasks: BackgroundTasks = None, current_user: dict = Depends(get_current_user)):
+async def upload_video(file: UploadFile = File(...), camera_id: str = Form(None), current_user: dict = Depends(get_current_user), db=Depends(get_database)):
     print(f"DEBUG: Upload request received. Filename: '{file.filename}'", flush=True)
-    file_location = f"{UPLOAD_DIR}/{file.filename}"
-    print(f"DEBUG: Saving to {file_location}", flush=True)
-    with open(file_location, "wb+") as file_object:
-        shutil.copyfileobj(file.file, file_object)
-    print(f"DEBUG: File saved. Size: {os.path.getsize(file_location)} bytes", flush=True)
     
-    # Trigger processing in background
-    if background_tasks:
-        print(f"DEBUG: Adding background task for {file_location}", flush=True)
-        background_tasks.add_task(detector.process_video, file_location, current_user["username"])
+    # No queue check up front: a duplicate is served from the cache or a running
+    # job even when the queue is full; start_processing() rejects the rest
+    # Stream to disk and hash in one pass (off the event loop), then store under the content hash
+    incoming = upload_store.temp_path(UPLOAD_DIR, file.filename)
+    try:
+        sha256, size = await run_in_threadpool(upload_store.copy_hashed, file.file, incoming)
+    except Exception:
+        if os.path.exists(incoming):
+            os.remove(incoming)
+        raise
+    stored = upload_store.commit_upload(incoming, sha256, file.filename, UPLOAD_DIR)
+    print(f"DEBUG: File saved as {stored}. Size: {size} bytes", flush=True)
+    
+    return await start_processing(stored, sha256, file.filename, camera_id, current_user["username"], db)
+
+async def needs_new_job(stored, sha256, db):
+    # False when these bytes have a cached result or a queued/running job to join
+    model_version = detector.model_version()
+    if await upload_store.get_cached_result(db, sha256, model_version, UPLOAD_DIR):
+        return False
+    return job_manager.find_active(f"{UPLOAD_DIR}/{stored}", model_version) is None
+
+async def start_processing(stored, sha256, original_filename, camera_id, username, db):
+    # Cached result for these bytes and this model, an in-flight job to join, or a new job
+    model_version = detector.model_version()
+    cached = await upload_store.get_cached_result(db, sha256, model_version, UPLOAD_DIR)
+    if cached:
+        print(f"DEBUG: Cache hit for {stored} (model {model_version})", flush=True)
+        # This user gets their own alert; the cached one went to whoever ran the job
+        mail_sent = await run_in_threadpool(detector.alert_for_result, os.path.join(UPLOAD_DIR, stored), cached["result"], username, camera_id)
+        result = dict(cached["result"], mail_sent=mail_sent)
+        analytics.rollups.record(username, camera_id, detection_store.parse_timestamp(result.get("timestamp")), analytics.result_detections(result))
+        json_path = os.path.join(UPLOAD_DIR, f"processed_{os.path.splitext(stored)[0]}.json")
+        detection_store.spawn(detection_store.store_result(db, username, stored, result, camera_id, json_path))
+        return {
+            "info": f"file '{original_filename}' already processed",
+            "status": "completed",
+            "cached": True,
+            "filename": stored,
+            "original_filename": original_filename,
+            "result": result
+        }
+    
+    # No awaits from here on, so a concurrent duplicate can't slip between the check and the submit
+    file_location = f"{UPLOAD_DIR}/{stored}"
+    active = job_manager.find_active(file_location, model_version)
+    job = job_manager.join(active, username) if active else None
+    if job:
+        # Alerted with their own status when the job finishes (alert_joined_users)
+        print(f"DEBUG: {stored} is already being processed, joined job {job['job_id']}", flush=True)
     else:
-        print("ERROR: No background_tasks object!", flush=True)
+        # Queue processing on the inference worker pool
+        try:
+            job = job_manager.submit(file_location, username, stored, camera_id, sha256, model_version)
+        except QueueFullError as e:
+            print(f"DEBUG: {e}", flush=True)
+            raise HTTPException(status_code=503, detail="Server is busy processing other uploads. Please try again shortly.", headers={"Retry-After": "30"})
+        print(f"DEBUG: Queued job {job['job_id']} for {file_location} (position {job['queue_position']})", flush=True)
         
-    return {"info": f"file '{file.filename}' saved at '{file_location}'", "status": "processing_started"}
+    return {
+        "info": f"file '{original_filename}' saved as '{stored}'",
+        "status": "processing_started",
+        "cached": False,
+        "filename": stored,
+        "original_filename": original_filename,
+        "job_id": job["job_id"],
+        "state": job["state"],
+        "queue_position": job["queue_position"]
+    }
+
+# Resumable uploads: POST /upload/sessions, then PUT the raw bytes in order with
+# ?offset=, then POST .../finalize. After a dropped connection, GET the session
+# for the offset to resume from.
+def upload_session_error(e):
+    return HTTPException(status_code=e.status_code, detail=str(e))
+
+@app.post("/upload/sessions")
+async def create_upload_session(body: UploadSessionCreate, current_user: dict = Depends(get_current_user)):
+    if job_manager.is_full():
+        raise HTTPException(status_code=503, detail="Server is busy processing other uploads. Please try again shortly.", headers={"Retry-After": "30"})
+    try:
+        session = await run_in_threadpool(upload_sessions.create, current_user["username"], body.filename, body.size, body.camera_id)
+    except upload_store.UploadSessionError as e:
+        raise upload_session_error(e)
+    print(f"DEBUG: Upload session {session['upload_id']} created for '{body.filename}' ({body.size} bytes)", flush=True)
+    return session
+
+@app.get("/upload/sessions/{upload_id}")
+async def get_upload_session(upload_id: str, current_user: dict = Depends(get_current_user)):
+    try:
+        return await run_in_threadpool(upload_sessions.status, upload_id, current_user["username"])
+    except upload_store.UploadSessionError as e:
+        raise upload_session_error(e)
+
+@app.put("/upload/sessions/{upload_id}")
+async def put_upload_chunk(upload_id: str, request: Request, offset: int = Query(..., ge=0), current_user: dict = Depends(get_current_user)):
+    # The body is read as it arrives and appended to the part file; it is never spooled
+    try:
+        received = await upload_sessions.write(upload_id, current_user["username"], offset, request.stream())
+    except upload_store.UploadSessionError as e:
+        raise upload_session_error(e)
+    return {"upload_id": upload_id, "offset": received}
+
+@app.post("/upload/sessions/{upload_id}/finalize")
+async def finalize_upload_session(upload_id: str, sha256: str = None, current_user: dict = Depends(get_current_user), db=Depends(get_database)):
+    try:
+        session, digest = await run_in_threadpool(upload_sessions.checksum, upload_id, current_user["username"], sha256)
+        # Check before finalizing, so a busy server leaves the session intact to retry;
+        # a duplicate that needs no new job goes through regardless
+        if job_manager.is_full() and await needs_new_job(upload_store.stored_name(digest, session["filename"]), digest, db):
+            raise HTTPException(status_code=503, detail="Server is busy processing other uploads. Please try again shortly.", headers={"Retry-After": "30"})
+        session, stored, digest = await run_in_threadpool(upload_sessions.finalize, upload_id, current_user["username"], digest)
+    except upload_store.UploadSessionError as e:
+        raise upload_session_error(e)
+    print(f"DEBUG: Upload session {upload_id} finalized as {stored}", flush=True)
+    return await start_processing(stored, digest, session["filename"], session["camera_id"], current_user["username"], db)
+
+@app.delete("/upload/sessions/{upload_id}")
+async def abort_upload_session(upload_id: str, current_user: dict = Depends(get_current_user)):
+    try:
+        await run_in_threadpool(upload_sessions.abort, upload_id, current_user["username"])
+    except upload_store.UploadSessionError as e:
+        raise upload_session_error(e)
+    return {"upload_id": upload_id, "status": "aborted"}
+
+@app.get("/jobs")
+async def get_job_queue(current_user: dict = Depends(get_current_user)):
+    return job_manager.stats()
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str, current_user: dict = Depends(get_current_user)):
+    job = job_manager.get(job_id)
+    if job is None or current_user["username"] not in job["users"]:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@app.get("/jobs/{job_id}/events")
+async def job_events(job_id: str, request: Request, token: str = None, cursor: int = 0, db=Depends(get_database)):
+    # Server-sent events: job state transitions and progress, pushed as they happen.
+    # EventSource can't set headers, so the token comes as a query parameter.
+    # Reconnects resume after Last-Event-ID (or ?cursor=); /results stays as the polling fallback.
+    if not token:
+        raise HTTPException(status_code=401, detail="Missing token")
+    current_user = await get_current_user(token, db)
+    job = job_manager.get(job_id)
+    if job is None or current_user["username"] not in job["users"]:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    last_event_id = request.headers.get("last-event-id")
+    if last_event_id and last_event_id.isdigit():
+        cursor = int(last_event_id)
+    
+    async def stream():
+        nonlocal cursor
+        yield "retry: 3000\n\n"
+        while not await request.is_disconnected():
+            new_events = await job_manager.events.wait_for_events(job_id, cursor)
+            if not new_events:
+                yield ": keepalive\n\n"
+                continue
+            for entry in new_events:
+                cursor = entry["id"]
+                data = entry["data"]
+                if data.get("result"):
+                    data = dict(data, result=result_for_user(data["result"], current_user["username"]))
+                yield f"id: {entry['id']}\nevent: {entry['event']}\ndata: {json.dumps(data)}\n\n"
+                if entry["event"] == "state" and entry["data"]["state"] in ("done", "failed"):
+                    return
+    
+    return StreamingResponse(stream(), media_type="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
 
 @app.get("/results/{filename}")
-async def get_results(filename: str):
+async def get_results(filename: str, cursor: int = None, limit: int = 500):
     # Construct expected JSON path
     # If filename is "image.png", json is "processed_image.json"
     base_name = os.path.splitext(filename)[0]
@@ -156,38 +439,149 @@ async def get_results(filename: str):
     
     if os.path.exists(json_path):
         with open(json_path, "r") as f:
-            return json.load(f)
-            
-    # Check if original file exists
-    file_path = os.path.join(UPLOAD_DIR, filename)
-    if not os.path.exists(file_path):
-        return {"status": "error", "message": "File not found on server"}
+            data = json.load(f)
+    else:
+        # Check if original file exists
+        file_path = os.path.join(UPLOAD_DIR, filename)
+        if not os.path.exists(file_path):
+            return {"status": "error", "message": "File not found on server"}
+        
+        data = {"status": "processing"}
+        progress = read_progress(json_path)
+        if progress:
+            data["progress"] = progress
+    
+    # Page through per-frame video detections: ?cursor=0, then ?cursor=<next_cursor>
+    if cursor is not None:
+        try:
+            data["frames"] = read_sidecar(json_path, cursor, min(max(1, limit), 5000))
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
     
-    return {"status": "processing"}
+    return data
+
+@app.get("/detections")
+async def list_detections(class_id: list[int] = Query(None), min_confidence: float = None, since: datetime = None, until: datetime = None,
+                          camera_id: str = None, source: str = None, cursor: str = None, limit: int = 100,
+                          current_user: dict = Depends(get_current_user), db=Depends(get_database)):
+    # e.g. /detections?class_id=2&class_id=3&min_confidence=0.6&since=2024-05-01T00:00:00Z
+    # then repeat with ?cursor=<next_cursor> until it comes back null
+    try:
+        return await detection_store.query_detections(
+            db, current_user["username"], class_id, min_confidence,
+            since and (since if since.tzinfo else since.astimezone()),
+            until and (until if until.tzinfo else until.astimezone()),
+            camera_id, source, cursor, min(max(1, limit), 1000))
+    except (ValueError, InvalidId):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+@app.get("/analytics")
+async def get_analytics(granularity: str = "hour", since: datetime = None, until: datetime = None, camera_id: str = None,
+                        current_user: dict = Depends(get_current_user), db=Depends(get_database)):
+    # Reads only the pre-aggregated rollups (default window: 24h of hours / 30 days of days)
+    if granularity not in analytics.GRANULARITIES:
+        raise HTTPException(status_code=400, detail=f"granularity must be one of {', '.join(analytics.GRANULARITIES)}")
+    return await analytics.query_rollups(
+        db, current_user["username"], granularity,
+        since and (since if since.tzinfo else since.astimezone()),
+        until and (until if until.tzinfo else until.astimezone()),
+        camera_id)
 
 @app.websocket("/ws/detect")
-async def websocket_endpoint(websocket: WebSocket):
+async def websocket_endpoint(websocket: WebSocket, token: str = None, mode: str = "base64", camera_id: str = None, db=Depends(get_database)):
     await websocket.accept()
     print(">>> WEBSOCKET CONNECTED <<<", flush=True)
+    
+    # Alerts go to the logged-in user (?token=...); without one process_frame falls back to MAIL_RECIPIENT
+    user_email = ""
+    if token:
+        try:
+            user_email = (await get_current_user(token, db))["username"]
+        except HTTPException:
+            await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+            return
+    
+    # Response mode (?mode=base64|binary|detections), switchable mid-stream
+    # with a text message {"mode": "..."}
+    if mode not in detector.RESPONSE_MODES:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    response_mode = {"value": mode}
+    
+    loop = asyncio.get_running_loop()
+    slot = LatestFrameSlot()
+    stats = LiveStats()
+    
+    async def receive_frames():
+        # Keep only the newest frame; anything not yet inferred is dropped
+        try:
+            while True:
+                message = await websocket.receive()
+                if message["type"] == "websocket.disconnect":
+                    raise WebSocketDisconnect(message.get("code", 1000))
+                if message.get("text") is not None:
+                    try:
+                        requested = json.loads(message["text"]).get("mode")
+                    except (ValueError, AttributeError):
+                        requested = None
+                    if requested in detector.RESPONSE_MODES:
+                        response_mode["value"] = requested
+                    continue
+                data = message.get("bytes")
+                if not data:
+                    continue
+                stats.record_received()
+                if slot.put(data):
+                    stats.record_dropped()
+        except WebSocketDisconnect:
+            print(">>> WEBSOCKET DISCONNECTED <<<", flush=True)
+        except Exception as e:
+            print(f"WebSocket Error: {e}", flush=True)
+        finally:
+            slot.close()
+    
+    receiver = asyncio.create_task(receive_frames())
     try:
         while True:
-            data = await websocket.receive_bytes()
-            # Process frame
-            results = detector.process_frame(data)
-            # Send back JSON
+            data, received_at = await slot.get()
+            if data is None:
+                break
+            results = await loop.run_in_executor(live_executor, detector.process_frame, data, user_email, response_mode["value"], True, camera_id)
+            stats.record_inferred(time.monotonic() - received_at)
+            results["stats"] = stats.snapshot()
+            if user_email and "detections" in results:
+                analytics.rollups.record(user_email, camera_id, datetime.now(timezone.utc), results["detections"], live=True)
+                detection_store.spawn(detection_store.store_live(db, user_email, results, camera_id))
+            jpeg = results.pop("jpeg", None)
+            # Send back JSON; in binary mode the annotated JPEG follows as its own binary message
+            results["image_follows"] = jpeg is not None
             await websocket.send_json(results)
+            if jpeg is not None:
+                await websocket.send_bytes(jpeg)
     except WebSocketDisconnect:
         print(">>> WEBSOCKET DISCONNECTED <<<", flush=True)
     except Exception as e:
         print(f"WebSocket Error: {e}", flush=True)
+    finally:
+        receiver.cancel()
 
 @app.post("/detect_frame")
-async def detect_frame(file: UploadFile = File(...), current_user: dict = Depends(get_current_user)):
+async def detect_frame(file: UploadFile = File(...), mode: str = "base64", camera_id: str = None, current_user: dict = Depends(get_current_user), db=Depends(get_database)):
     print(">>> REQUEST RECEIVED at /detect_frame <<<", flush=True)
+    if mode not in detector.RESPONSE_MODES:
+        raise HTTPException(status_code=400, detail=f"mode must be one of {', '.join(detector.RESPONSE_MODES)}")
     try:
         image_bytes = await file.read()
-        # Call the process_frame function from detector module
-        results = detector.process_frame(image_bytes, current_user["username"])
+        # Call the process_frame function from detector module, off the event loop
+        loop = asyncio.get_running_loop()
+        results = await loop.run_in_executor(live_executor, detector.process_frame, image_bytes, current_user["username"], mode, True, camera_id)
+        if "detections" in results:
+            analytics.rollups.record(current_user["username"], camera_id, datetime.now(timezone.utc), results["detections"], live=True)
+            detection_store.spawn(detection_store.store_live(db, current_user["username"], results, camera_id))
+        jpeg = results.pop("jpeg", None)
+        if jpeg is not None:
+            # Binary mode: the annotated JPEG is the body, detections ride along in a header
+            return Response(content=jpeg, media_type="image/jpeg", headers={"X-Detections": json.dumps(results)})
         return results
     except Exception as e:
         print(f"Error in detect_frame: {e}")
@@ -253,6 +647,7 @@ async def callback_google(code: str, db=Depends(get_database)):
                 {"username": email},
                 {"$set": {"name": name, "picture": picture}}
             )
+        user_cache.invalidate(email)
             
         # Create token
         access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
@@ -283,6 +678,7 @@ async def upload_avatar(file: UploadFile = File(...), current_user: dict = Depen
             {"username": current_user["username"]},
             {"$set": {"picture": avatar_url}}
         )
+        user_cache.invalidate(current_user["username"])
         
         return {"info": "Avatar updated successfully", "picture": avatar_url}
         
@@ -320,6 +716,7 @@ async def callback_github(code: str, db=Depends(get_database)):
         if not user:
              user_dict = {"username": username, "hashed_password": "oauth_user"}
              await db.users.insert_one(user_dict)
+             user_cache.invalidate(username)
              
         # Create token
         access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
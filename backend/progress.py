@@ -0,0 +1,111 @@
+import os
+import json
+import time
+
+# Incremental output for long video jobs:
+#  - <json>.detections.jsonl: one line per frame, appended as frames are encoded
+#  - <json>.progress.json:    frames done / total, fps and ETA, rewritten about once a second
+# Both live next to the final processed_*.json so /results can serve them
+# while the job is still running.
+
+PROGRESS_INTERVAL = 1.0 # Seconds between progress rewrites / sidecar flushes
+
+def sidecar_path(json_path):
+    return os.path.splitext(json_path)[0] + ".detections.jsonl"
+
+def progress_path(json_path):
+    return os.path.splitext(json_path)[0] + ".progress.json"
+
+def _write_json_atomic(path, data):
+    # Readers never see a half-written file
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+class VideoProgress:
+    def __init__(self, json_path, frames_total, fps, on_update=None, extra=None):
+        self.sidecar_path = sidecar_path(json_path)
+        self.progress_path = progress_path(json_path)
+        self.frames_total = frames_total if frames_total > 0 else None
+        self.fps = fps
+        self.frames_done = 0
+        self.started = time.time()
+        self.last_update = 0.0
+        self.on_update = on_update # Called with each progress record (job events)
+        self.extra = extra # Returns fields to add to each record (e.g. the HLS playlist URL)
+        self.sidecar = open(self.sidecar_path, "w", encoding="utf-8")
+        self._write_progress("processing")
+
+    def add_frame(self, index, inferred, detections):
+        record = {
+            "frame": index,
+            "t": round(index / self.fps, 3) if self.fps else None,
+            "inferred": inferred,
+            "detections": detections,
+        }
+        self.sidecar.write(json.dumps(record) + "\n")
+        self.frames_done += 1
+
+        now = time.time()
+        if now - self.last_update >= PROGRESS_INTERVAL:
+            self.sidecar.flush()
+            self._write_progress("processing")
+
+    def close(self, status="completed"):
+        self.sidecar.close()
+        self._write_progress(status)
+
+    def _write_progress(self, status):
+        now = time.time()
+        self.last_update = now
+        elapsed = now - self.started
+        rate = self.frames_done / elapsed if elapsed > 0 else 0.0
+        remaining = (self.frames_total - self.frames_done) if self.frames_total else None
+        record = {
+            "status": status,
+            "frames_done": self.frames_done,
+            "frames_total": self.frames_total,
+            "fps": round(rate, 2),
+            "eta_seconds": round(remaining / rate, 1) if rate > 0 and remaining is not None else None,
+            "updated": now,
+        }
+        if self.extra:
+            record.update(self.extra())
+        _write_json_atomic(self.progress_path, record)
+        if self.on_update:
+            self.on_update(record)
+
+def read_progress(json_path):
+    try:
+        with open(progress_path(json_path), "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def read_sidecar(json_path, cursor=0, limit=500):
+    # Page through the sidecar by byte offset so long videos are never loaded
+    # whole. Only complete lines are returned; next_cursor resumes after them.
+    # Raises ValueError for a cursor that isn't the start of a line.
+    path = sidecar_path(json_path)
+    frames = []
+    if cursor < 0:
+        raise ValueError(f"Invalid cursor {cursor}")
+    if not os.path.exists(path):
+        return {"frames": frames, "next_cursor": cursor, "eof": True}
+
+    with open(path, "rb") as f:
+        if cursor > os.fstat(f.fileno()).st_size:
+            raise ValueError(f"Cursor {cursor} is past the end of the sidecar")
+        if cursor > 0:
+            f.seek(cursor - 1)
+            if f.read(1) != b"\n":
+                raise ValueError(f"Cursor {cursor} is not at the start of a frame record")
+        while len(frames) < limit:
+            line = f.readline()
+            if not line.endswith(b"\n"):
+                break # End of file, or a line the encoder is still writing
+            frames.append(json.loads(line))
+            cursor += len(line)
+        eof = f.read(1) == b""
+    return {"frames": frames, "next_cursor": cursor, "eof": eof}
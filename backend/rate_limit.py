@@ -0,0 +1,159 @@
+import os
+import time
+import threading
+from datetime import datetime, timedelta
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Alert rate limiting, keyed by (user, camera) so one busy camera can't
+# silence everyone else.
+#
+# Token bucket: each key holds up to ALERT_BURST alerts and earns one back
+# every ALERT_COOLDOWN seconds (the defaults match the old single 60 s
+# cooldown, but per key). Two backends:
+#   memory - per process; fine for a single API worker
+#   mongo  - one bucket per key in MongoDB, updated atomically, so limits hold
+#            across uvicorn workers and inference processes. A key known to
+#            be empty is refused locally until its next token is due, so a
+#            busy camera doesn't cost a round trip per frame.
+#
+# allow() takes a token up front; callers refund() it when the alert could not
+# be queued, so a failed alert doesn't silence the key for a whole cooldown.
+
+ALERT_RATE_BACKEND = os.getenv("ALERT_RATE_BACKEND", "memory")
+ALERT_COOLDOWN = float(os.getenv("ALERT_COOLDOWN", "60")) # Seconds to earn back one alert
+ALERT_BURST = float(os.getenv("ALERT_BURST", "1")) # Alerts a key can send back to back
+
+def rate_key(user, camera_id=None):
+    return f"{user or '-'}|{camera_id or '-'}"
+
+class InProcessRateLimiter:
+    def __init__(self, cooldown=ALERT_COOLDOWN, burst=ALERT_BURST):
+        self.rate = 1.0 / cooldown
+        self.capacity = max(1.0, burst)
+        self._lock = threading.Lock()
+        self._buckets = {} # key -> (tokens, updated)
+
+    def allow(self, user, camera_id=None):
+        key = rate_key(user, camera_id)
+        now = time.time()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (self.capacity, now))
+            tokens = min(self.capacity, tokens + (now - updated) * self.rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            self._buckets[key] = (tokens, now)
+            return allowed
+
+    def refund(self, user, camera_id=None):
+        key = rate_key(user, camera_id)
+        with self._lock:
+            if key in self._buckets:
+                tokens, updated = self._buckets[key]
+                self._buckets[key] = (min(self.capacity, tokens + 1), updated)
+
+class MongoRateLimiter:
+    COLLECTION = "alert_rate_limits"
+
+    def __init__(self, cooldown=ALERT_COOLDOWN, burst=ALERT_BURST):
+        # Synchronous client: callers are inference threads/processes, not the event loop
+        from pymongo import MongoClient
+        from database import MONGO_URL, DB_NAME
+        self.rate = 1.0 / cooldown
+        self.capacity = max(1.0, burst)
+        self._collection = MongoClient(MONGO_URL, serverSelectionTimeoutMS=2000)[DB_NAME][self.COLLECTION]
+        self._lock = threading.Lock()
+        self._blocked_until = {} # key -> time the next token is due
+        self._fallback = InProcessRateLimiter(cooldown, burst)
+        self._indexed = False
+        self._down_until = 0.0 # After a Mongo error, use the fallback for a while instead of waiting on timeouts
+
+    def allow(self, user, camera_id=None):
+        key = rate_key(user, camera_id)
+        now = time.time()
+        with self._lock:
+            if self._blocked_until.get(key, 0) > now:
+                return False
+            if self._down_until > now:
+                return self._fallback.allow(user, camera_id)
+
+        try:
+            tokens, allowed = self._take(key, now)
+        except Exception as e:
+            # Better a per-process limit than no alerts (or no limit) at all
+            print(f"Warning: Mongo rate limiter unavailable ({e}), using in-process limits for 30s", flush=True)
+            with self._lock:
+                self._down_until = now + 30
+            return self._fallback.allow(user, camera_id)
+
+        with self._lock:
+            if tokens < 1:
+                self._blocked_until[key] = now + (1 - tokens) / self.rate
+            else:
+                self._blocked_until.pop(key, None)
+        return allowed
+
+    def refund(self, user, camera_id=None):
+        key = rate_key(user, camera_id)
+        now = time.time()
+        with self._lock:
+            self._blocked_until.pop(key, None)
+            if self._down_until > now:
+                return self._fallback.refund(user, camera_id)
+        try:
+            self._collection.update_one(
+                {"_id": key},
+                [{"$set": {"tokens": {"$min": [self.capacity, {"$add": [{"$ifNull": ["$tokens", self.capacity]}, 1]}]}}}],
+            )
+        except Exception as e:
+            print(f"Warning: Could not refund alert token for {key}: {e}", flush=True)
+            self._fallback.refund(user, camera_id)
+
+    def _take(self, key, now):
+        from pymongo import ReturnDocument
+        if not self._indexed:
+            # Buckets expire once they would be full again anyway
+            self._collection.create_index("expires_at", expireAfterSeconds=0)
+            self._indexed = True
+
+        refilled = {"$min": [self.capacity, {"$add": [
+            {"$ifNull": ["$tokens", self.capacity]},
+            {"$multiply": [{"$subtract": [now, {"$ifNull": ["$updated", now]}]}, self.rate]},
+        ]}]}
+        expires_at = datetime.utcnow() + timedelta(seconds=self.capacity / self.rate)
+        # One atomic read-modify-write, so concurrent workers can't both take the last token
+        doc = self._collection.find_one_and_update(
+            {"_id": key},
+            [
+                {"$set": {"tokens": refilled, "updated": now}},
+                {"$set": {"granted": {"$gte": ["$tokens", 1]}}},
+                {"$set": {
+                    "tokens": {"$cond": ["$granted", {"$subtract": ["$tokens", 1]}, "$tokens"]},
+                    "expires_at": expires_at,
+                }},
+            ],
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        return doc["tokens"], doc["granted"]
+
+RATE_LIMITERS = {
+    "memory": InProcessRateLimiter,
+    "mongo": MongoRateLimiter,
+}
+
+_limiter = None
+_limiter_lock = threading.Lock()
+
+def get_alert_limiter():
+    global _limiter
+    if _limiter is None:
+        with _limiter_lock:
+            if _limiter is None:
+                if ALERT_RATE_BACKEND not in RATE_LIMITERS:
+                    raise ValueError(f"Unknown ALERT_RATE_BACKEND '{ALERT_RATE_BACKEND}' (expected one of: {', '.join(RATE_LIMITERS)})")
+                _limiter = RATE_LIMITERS[ALERT_RATE_BACKEND]()
+                print(f"DEBUG: Alert rate limiter: {ALERT_RATE_BACKEND}, {ALERT_BURST:g} alert(s) per key, one back every {ALERT_COOLDOWN:g}s", flush=True)
+    return _limiter
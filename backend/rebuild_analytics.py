@@ -0,0 +1,51 @@
+import asyncio
+from datetime import timezone
+from database import db
+from analytics import RollupBuffer, ensure_indexes, write_increments, result_detections
+from detection_store import ensure_indexes as ensure_detection_indexes
+
+# Recompute the analytics rollups from the raw data in MongoDB: the stored
+# job results (one scan each) and the stored live detections (one scan per
+# frame, i.e. per user/camera/timestamp). Live frames with nothing in them
+# were never stored as detections; their per-bucket count (live_empty_scans)
+# is carried over from the current rollups so scan totals don't drop.
+#
+#   python rebuild_analytics.py
+
+async def main():
+    await ensure_indexes(db)
+    await ensure_detection_indexes(db)
+    buffer = RollupBuffer()
+
+    results = 0
+    async for result in db.results.find({"status": "completed"}):
+        buffer.record(result["user"], result.get("camera_id"), result["timestamp"], result_detections(result))
+        results += 1
+
+    frames = 0
+    pipeline = [
+        {"$match": {"source": "live"}},
+        {"$group": {"_id": {"user": "$user", "camera_id": "$camera_id", "timestamp": "$timestamp"},
+                    "detections": {"$push": {"class_id": "$class_id"}}}},
+    ]
+    async for frame in db.detections.aggregate(pipeline, allowDiskUse=True):
+        key = frame["_id"]
+        buffer.record(key["user"], key.get("camera_id"), key["timestamp"], frame["detections"])
+        frames += 1
+
+    empty = 0
+    async for doc in db.analytics_rollups.find({"live_empty_scans": {"$gt": 0}}):
+        count = doc["live_empty_scans"]
+        buffer.add(doc["granularity"], doc["user"], doc.get("camera_id"), doc["bucket"].replace(tzinfo=timezone.utc),
+                   {"scans": count, "live_empty_scans": count})
+        if doc["granularity"] == "hour":
+            empty += count
+
+    pending = buffer.drain()
+    await db.analytics_rollups.delete_many({})
+    await write_increments(db, pending)
+    print(f"Rebuilt {len(pending)} rollup buckets from {results} results, {frames} live frames "
+          f"and {empty} empty live scans")
+
+if __name__ == '__main__':
+    asyncio.run(main())
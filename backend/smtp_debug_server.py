@@ -0,0 +1,87 @@
+import os
+import sys
+import time
+import socketserver
+from email import message_from_bytes
+
+# Local stand-in for the alert SMTP server. Accepts any login, prints a line
+# per message and saves each one as a .eml file, so alerts can be tested
+# without sending real mail:
+#
+#   python smtp_debug_server.py [port] [output_dir]
+#   SMTP_HOST=localhost SMTP_PORT=1025 SMTP_STARTTLS=0 uvicorn main:app
+
+class SMTPHandler(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        self.wfile.write((line + "\r\n").encode())
+
+    def handle(self):
+        self.reply("220 smtp-debug ready")
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode(errors="replace").strip()
+            verb = command.split(" ", 1)[0].upper()
+
+            if verb == "EHLO":
+                self.reply("250-smtp-debug")
+                self.reply("250 AUTH PLAIN LOGIN")
+            elif verb == "HELO":
+                self.reply("250 smtp-debug")
+            elif verb == "AUTH":
+                # Accept any credentials; AUTH LOGIN asks for username and password
+                if command.upper().startswith("AUTH LOGIN"):
+                    parts = command.split()
+                    if len(parts) < 3:
+                        self.reply("334 VXNlcm5hbWU6")
+                        self.rfile.readline()
+                    self.reply("334 UGFzc3dvcmQ6")
+                    self.rfile.readline()
+                self.reply("235 Authentication successful")
+            elif verb in ("MAIL", "RCPT", "RSET", "NOOP"):
+                self.reply("250 OK")
+            elif verb == "DATA":
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                self.save(self.read_data())
+                self.reply("250 Queued")
+            elif verb == "QUIT":
+                self.reply("221 Bye")
+                return
+            else:
+                self.reply("502 Command not implemented")
+
+    def read_data(self):
+        lines = []
+        while True:
+            line = self.rfile.readline()
+            if not line or line in (b".\r\n", b".\n"):
+                break
+            lines.append(line[1:] if line.startswith(b"..") else line)
+        return b"".join(lines)
+
+    def save(self, data):
+        self.server.count += 1
+        msg = message_from_bytes(data)
+        attachments = [part.get_filename() for part in msg.walk() if part.get_filename()]
+        path = os.path.join(self.server.output_dir, f"{time.strftime('%Y%m%d-%H%M%S')}-{self.server.count}.eml")
+        with open(path, "wb") as f:
+            f.write(data)
+        print(f"[{time.strftime('%H:%M:%S')}] To: {msg['To']}  Subject: {msg['Subject']}  Attachments: {attachments}  -> {path}", flush=True)
+
+class DebugSMTPServer(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, address, output_dir):
+        super().__init__(address, SMTPHandler)
+        self.output_dir = output_dir
+        self.count = 0
+        os.makedirs(output_dir, exist_ok=True)
+
+if __name__ == '__main__':
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 1025
+    output_dir = sys.argv[2] if len(sys.argv) > 2 else "debug_mail"
+    with DebugSMTPServer(("localhost", port), output_dir) as server:
+        print(f"Debug SMTP server on localhost:{port}, saving messages to {output_dir}/", flush=True)
+        server.serve_forever()
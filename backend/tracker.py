@@ -0,0 +1,169 @@
+import os
+import numpy as np
+
+# Lightweight multi-object tracker for video jobs (ByteTrack-style).
+#
+# Each track carries a constant-velocity Kalman filter over (cx, cy, w, h).
+# Every frame the tracks are predicted forward; on frames the detector ran,
+# detections are matched to tracks by IoU in two passes: confident detections
+# first, then the low-confidence leftovers, which can only extend existing
+# tracks (this keeps a subject tracked through partial occlusion without
+# letting weak boxes start new tracks). Between detector frames the
+# predicted boxes stand in for detections.
+
+TRACK_LOW_CONF = float(os.getenv("TRACK_LOW_CONF", "0.1")) # Detector threshold when tracking; boxes below VIDEO_CONF can only extend a track
+TRACK_MATCH_IOU = float(os.getenv("TRACK_MATCH_IOU", "0.3"))
+TRACK_MAX_AGE = int(os.getenv("TRACK_MAX_AGE", "30")) # Frames a track survives without a match
+TRACK_MIN_HITS = int(os.getenv("TRACK_MIN_HITS", "2")) # Matches needed before a track makes the job summary
+
+def iou(a, b):
+    x1, y1 = max(a[0], b[0]), max(a[1], b[1])
+    x2, y2 = min(a[2], b[2]), min(a[3], b[3])
+    inter = max(0.0, x2 - x1) * max(0.0, y2 - y1)
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+class KalmanBox:
+    # State: cx, cy, w, h and their per-frame velocities
+    def __init__(self, box):
+        self.x = np.zeros(8)
+        self.x[:4] = self._measure(box)
+        size = max(self.x[2], self.x[3], 1.0)
+        self.P = np.diag([size / 10] * 4 + [size / 4] * 4) ** 2
+        self.F = np.eye(8)
+        self.F[:4, 4:] = np.eye(4)
+        self.H = np.eye(4, 8)
+
+    @staticmethod
+    def _measure(box):
+        x1, y1, x2, y2 = box[:4]
+        return np.array([(x1 + x2) / 2, (y1 + y2) / 2, x2 - x1, y2 - y1], dtype=float)
+
+    def _noise(self):
+        # Noise scales with the box size so small and large subjects behave alike
+        size = max(self.x[2], self.x[3], 1.0)
+        return size / 20, size / 160
+
+    def predict(self):
+        position, velocity = self._noise()
+        Q = np.diag([position] * 4 + [velocity] * 4) ** 2
+        self.x = self.F @ self.x
+        self.x[2:4] = np.maximum(self.x[2:4], 1.0)
+        self.P = self.F @ self.P @ self.F.T + Q
+
+    def update(self, box):
+        position, _ = self._noise()
+        R = np.diag([position] * 4) ** 2
+        S = self.H @ self.P @ self.H.T + R
+        K = self.P @ self.H.T @ np.linalg.inv(S)
+        self.x = self.x + K @ (self._measure(box) - self.H @ self.x)
+        self.P = (np.eye(8) - K @ self.H) @ self.P
+
+    def box(self):
+        cx, cy, w, h = self.x[:4]
+        return [int(cx - w / 2), int(cy - h / 2), int(cx + w / 2), int(cy + h / 2)]
+
+class Track:
+    def __init__(self, track_id, detection, frame_index):
+        self.track_id = track_id
+        self.cls = detection[4]
+        self.conf = detection[5]
+        self.max_conf = detection[5]
+        self.kalman = KalmanBox(detection)
+        self.hits = 1
+        self.first_frame = frame_index
+        self.last_frame = frame_index
+        self.active = True # Matched on the latest detector frame
+
+    def match(self, detection, frame_index):
+        self.kalman.update(detection)
+        self.conf = detection[5]
+        self.max_conf = max(self.max_conf, detection[5])
+        self.hits += 1
+        self.last_frame = frame_index
+        self.active = True
+
+class ByteTracker:
+    def __init__(self, high_conf, match_iou=TRACK_MATCH_IOU, max_age=TRACK_MAX_AGE, min_hits=TRACK_MIN_HITS):
+        self.high_conf = high_conf
+        self.match_iou = match_iou
+        self.max_age = max_age
+        self.min_hits = min_hits
+        self.tracks = []
+        self.finished = [] # Tracks that aged out, kept for the summary
+        self._next_id = 1
+
+    def step(self, frame_index, detections=None):
+        """Advance one frame. detections is a list of (x1, y1, x2, y2, cls, conf)
+        for frames the detector ran on, or None for frames it skipped.
+        Returns the active tracks' boxes as (track_id, [x1, y1, x2, y2], cls, conf)."""
+        for track in self.tracks:
+            track.kalman.predict()
+
+        if detections is not None:
+            self._associate(frame_index, detections)
+
+        return [(track.track_id, track.kalman.box(), track.cls, track.conf)
+                for track in self.tracks if track.active]
+
+    def _associate(self, frame_index, detections):
+        high = [det for det in detections if det[5] >= self.high_conf]
+        low = [det for det in detections if det[5] < self.high_conf]
+
+        # Pass 1: confident detections against every track; pass 2: weak ones against the rest
+        unmatched_tracks, unmatched_high = self._match(self.tracks, high, frame_index)
+        unmatched_tracks, _ = self._match(unmatched_tracks, low, frame_index)
+
+        for track in unmatched_tracks:
+            track.active = False
+        for det in unmatched_high:
+            self.tracks.append(Track(self._next_id, det, frame_index))
+            self._next_id += 1
+
+        # Age by frames, not detector passes, so max_age means the same with any detect interval
+        alive = []
+        for track in self.tracks:
+            (alive if frame_index - track.last_frame <= self.max_age else self.finished).append(track)
+        self.tracks = alive
+
+    def _match(self, tracks, detections, frame_index):
+        # Greedy highest-IoU-first matching; classes never mix
+        pairs = []
+        for t, track in enumerate(tracks):
+            predicted = track.kalman.box()
+            for d, det in enumerate(detections):
+                if det[4] != track.cls:
+                    continue
+                overlap = iou(predicted, det)
+                if overlap >= self.match_iou:
+                    pairs.append((overlap, t, d))
+
+        used_tracks, used_dets = set(), set()
+        for _, t, d in sorted(pairs, reverse=True):
+            if t in used_tracks or d in used_dets:
+                continue
+            tracks[t].match(detections[d], frame_index)
+            used_tracks.add(t)
+            used_dets.add(d)
+
+        return ([track for t, track in enumerate(tracks) if t not in used_tracks],
+                [det for d, det in enumerate(detections) if d not in used_dets])
+
+    def summaries(self, names, fps=None):
+        # One record per track that was matched at least min_hits times
+        summaries = []
+        for track in sorted(self.finished + self.tracks, key=lambda track: track.track_id):
+            if track.hits < self.min_hits:
+                continue
+            summaries.append({
+                "track_id": track.track_id,
+                "class_id": track.cls,
+                "label": names[track.cls],
+                "first_frame": track.first_frame,
+                "last_frame": track.last_frame,
+                "first_seen": round(track.first_frame / fps, 3) if fps else None,
+                "last_seen": round(track.last_frame / fps, 3) if fps else None,
+                "detections": track.hits,
+                "max_confidence": round(track.max_conf, 4),
+            })
+        return summaries
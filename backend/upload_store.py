@@ -0,0 +1,272 @@
+import os
+import json
+import time
+import asyncio
+import uuid
+import hashlib
+import threading
+from datetime import datetime, timezone
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Content-addressed uploads and a result cache.
+#
+# Uploads are hashed (sha256) while they stream to disk and stored as
+# <sha256><ext>, so identical files share one copy and different files with
+# the same client name no longer overwrite each other. Finished results are
+# cached in MongoDB under <sha256>:<model version>; uploading the same bytes
+# again while the model and inference settings are unchanged returns the
+# cached result instead of queuing another run.
+#
+# Large files can use resumable upload sessions instead of one multipart POST:
+# create a session, PUT the bytes in order at increasing offsets, finalize.
+# Chunks are appended straight to uploads/.upload-<id>.part, so nothing is
+# spooled or copied, and after a dropped connection the client asks for the
+# current offset and carries on from there. The part file is hashed once, in a
+# single sequential read, when the session is finalized.
+
+UPLOAD_CHUNK = 1024 * 1024 # Bytes read/written per step, so memory stays flat for any file size
+MAX_EXTENSION = 10
+UPLOAD_SESSION_CHUNK = int(os.getenv("UPLOAD_SESSION_CHUNK", str(8 * 1024 * 1024))) # Suggested PUT size for clients
+UPLOAD_SESSION_TTL = float(os.getenv("UPLOAD_SESSION_TTL", "86400")) # Seconds an idle session is kept
+UPLOAD_SESSION_SWEEP_INTERVAL = float(os.getenv("UPLOAD_SESSION_SWEEP_INTERVAL", "3600")) # Seconds between expiry sweeps
+UPLOAD_MAX_SIZE = int(os.getenv("UPLOAD_MAX_SIZE", str(20 * 1024 ** 3)))
+
+def safe_extension(filename):
+    ext = os.path.splitext(filename or "")[1].lower()
+    if len(ext) > MAX_EXTENSION or not ext[1:].isalnum():
+        return ""
+    return ext
+
+def stored_name(sha256, filename):
+    return f"{sha256}{safe_extension(filename)}"
+
+def temp_path(upload_dir, filename):
+    # Hidden, unique name while the bytes are still arriving
+    return os.path.join(upload_dir, f".incoming-{uuid.uuid4().hex}{safe_extension(filename)}")
+
+def copy_hashed(source, destination_path):
+    # Blocking: stream a file object to disk while hashing it. Returns (sha256, size).
+    digest = hashlib.sha256()
+    size = 0
+    with open(destination_path, "wb") as out:
+        while True:
+            chunk = source.read(UPLOAD_CHUNK)
+            if not chunk:
+                break
+            digest.update(chunk)
+            out.write(chunk)
+            size += len(chunk)
+    return digest.hexdigest(), size
+
+def commit_upload(path, sha256, filename, upload_dir):
+    # Move a fully written upload to its content address; returns the stored name.
+    # If the same bytes are already stored, the new copy is simply dropped.
+    name = stored_name(sha256, filename)
+    final_path = os.path.join(upload_dir, name)
+    if os.path.exists(final_path):
+        os.remove(path)
+    else:
+        os.replace(path, final_path)
+    return name
+
+def cache_key(sha256, model_version):
+    return f"{sha256}:{model_version}"
+
+async def get_cached_result(db, sha256, model_version, upload_dir):
+    # The cached result is only usable while its processed output is still on disk
+    entry = await db.result_cache.find_one({"_id": cache_key(sha256, model_version)})
+    if not entry:
+        return None
+    output = os.path.basename(entry["result"].get("video_url") or "")
+    if not output or not os.path.exists(os.path.join(upload_dir, output)):
+        return None
+    return entry
+
+async def put_cached_result(db, sha256, model_version, filename, result):
+    if result.get("status") != "completed":
+        return
+    await db.result_cache.replace_one(
+        {"_id": cache_key(sha256, model_version)},
+        {"filename": filename, "result": result, "cached_at": datetime.now(timezone.utc)},
+        upsert=True,
+    )
+
+def _append(out, data, offset):
+    out.write(data)
+    return offset + len(data)
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(UPLOAD_CHUNK)
+            if not chunk:
+                break
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class UploadSessionError(Exception):
+    def __init__(self, status_code, message):
+        super().__init__(message)
+        self.status_code = status_code
+
+class UploadSessions:
+    # Session state lives next to the part file (.upload-<id>.json), so it
+    # survives restarts and is visible to every API worker. Nothing about a
+    # session is kept in memory between requests, so consecutive chunks can
+    # land on different workers at no extra cost.
+    def __init__(self, upload_dir):
+        self.upload_dir = upload_dir
+        self._lock = threading.Lock()
+        self._session_locks = {} # upload_id -> lock held while a chunk is written
+
+    def _path(self, upload_id, suffix):
+        if not upload_id.isalnum():
+            raise UploadSessionError(404, "Upload session not found")
+        return os.path.join(self.upload_dir, f".upload-{upload_id}{suffix}")
+
+    def _session_lock(self, upload_id):
+        with self._lock:
+            return self._session_locks.setdefault(upload_id, threading.Lock())
+
+    def create(self, user, filename, size, camera_id=None):
+        if size < 0 or size > UPLOAD_MAX_SIZE:
+            raise UploadSessionError(413, f"Uploads are limited to {UPLOAD_MAX_SIZE} bytes")
+        upload_id = uuid.uuid4().hex
+        session = {
+            "upload_id": upload_id,
+            "user": user,
+            "filename": filename,
+            "size": size,
+            "camera_id": camera_id,
+            "created_at": time.time(),
+        }
+        open(self._path(upload_id, ".part"), "wb").close()
+        with open(self._path(upload_id, ".json"), "w") as f:
+            json.dump(session, f)
+        return self.status(upload_id, user)
+
+    def load(self, upload_id, user):
+        try:
+            with open(self._path(upload_id, ".json"), "r") as f:
+                session = json.load(f)
+        except (OSError, ValueError):
+            raise UploadSessionError(404, "Upload session not found")
+        if session["user"] != user:
+            raise UploadSessionError(404, "Upload session not found")
+        return session
+
+    def status(self, upload_id, user):
+        session = self.load(upload_id, user)
+        offset = os.path.getsize(self._path(upload_id, ".part"))
+        return dict(session, offset=offset, chunk_size=UPLOAD_SESSION_CHUNK)
+
+    async def write(self, upload_id, user, offset, stream):
+        # Append a request body (async iterable of bytes) at `offset`. Chunks must
+        # arrive in order; a mismatched offset is a 409 carrying the real one.
+        # Writes run in the default executor, UPLOAD_CHUNK at a time.
+        session = self.load(upload_id, user)
+        part_path = self._path(upload_id, ".part")
+        lock = self._session_lock(upload_id)
+        if not lock.acquire(blocking=False):
+            raise UploadSessionError(409, "Another chunk for this upload is still being written")
+        loop = asyncio.get_running_loop()
+        try:
+            current = os.path.getsize(part_path)
+            if offset != current:
+                raise UploadSessionError(409, f"Expected offset {current}")
+            with open(part_path, "r+b") as out:
+                out.seek(current)
+                buffer = bytearray()
+                async for chunk in stream:
+                    if current + len(buffer) + len(chunk) > session["size"]:
+                        raise UploadSessionError(413, f"Chunk runs past the declared size of {session['size']} bytes")
+                    buffer += chunk
+                    if len(buffer) >= UPLOAD_CHUNK:
+                        current = await loop.run_in_executor(None, _append, out, bytes(buffer), current)
+                        buffer.clear()
+                if buffer:
+                    current = await loop.run_in_executor(None, _append, out, bytes(buffer), current)
+            # Whatever reached the disk stays, even on error; the client resumes from it
+            return current
+        finally:
+            lock.release()
+
+    def checksum(self, upload_id, user, expected_sha256=None):
+        # Blocking: check the upload is whole and hash it. The digest is saved
+        # with the session, so a retried finalize doesn't read the file again.
+        # Returns (session, sha256).
+        session = self.load(upload_id, user)
+        part_path = self._path(upload_id, ".part")
+        with self._session_lock(upload_id):
+            size = os.path.getsize(part_path)
+            if size != session["size"]:
+                raise UploadSessionError(409, f"Upload incomplete: {size} of {session['size']} bytes received")
+            if not session.get("sha256"):
+                session["sha256"] = file_sha256(part_path)
+                with open(self._path(upload_id, ".json"), "w") as f:
+                    json.dump(session, f)
+        if expected_sha256 and expected_sha256.lower() != session["sha256"]:
+            raise UploadSessionError(422, "Checksum mismatch")
+        return session, session["sha256"]
+
+    def finalize(self, upload_id, user, expected_sha256=None):
+        # Blocking: checksum(), then move the upload to its content address.
+        # Returns (session, stored name, sha256).
+        session, sha256 = self.checksum(upload_id, user, expected_sha256)
+        part_path = self._path(upload_id, ".part")
+        with self._session_lock(upload_id):
+            if not os.path.exists(part_path):
+                raise UploadSessionError(404, "Upload session not found")
+            stored = commit_upload(part_path, sha256, session["filename"], self.upload_dir)
+            self._forget(upload_id)
+        return session, stored, sha256
+
+    def abort(self, upload_id, user):
+        self.load(upload_id, user)
+        with self._session_lock(upload_id):
+            self._forget(upload_id)
+
+    def _forget(self, upload_id):
+        for suffix in (".part", ".json"):
+            path = self._path(upload_id, suffix)
+            if os.path.exists(path):
+                os.remove(path)
+        with self._lock:
+            self._session_locks.pop(upload_id, None)
+
+    def expire(self):
+        # Drop sessions idle for longer than UPLOAD_SESSION_TTL; returns how many
+        cutoff = time.time() - UPLOAD_SESSION_TTL
+        expired = 0
+        for name in os.listdir(self.upload_dir):
+            if not (name.startswith(".upload-") and name.endswith(".json")):
+                continue
+            upload_id = name[len(".upload-"):-len(".json")]
+            part_path = self._path(upload_id, ".part")
+            last_write = os.path.getmtime(part_path) if os.path.exists(part_path) else 0
+            if last_write >= cutoff:
+                continue
+            lock = self._session_lock(upload_id)
+            if not lock.acquire(blocking=False):
+                continue # A chunk is being written right now, so it isn't idle
+            try:
+                self._forget(upload_id)
+            finally:
+                lock.release()
+            expired += 1
+        return expired
+
+async def run_session_sweeper(sessions):
+    # Background task for the API's lifetime: enforce UPLOAD_SESSION_TTL
+    loop = asyncio.get_running_loop()
+    while True:
+        try:
+            expired = await loop.run_in_executor(None, sessions.expire)
+            if expired:
+                print(f"DEBUG: Dropped {expired} stale upload session(s)", flush=True)
+        except Exception as e:
+            print(f"Warning: Upload session sweep failed: {e}", flush=True)
+        await asyncio.sleep(UPLOAD_SESSION_SWEEP_INTERVAL)
@@ -0,0 +1,52 @@
+import os
+import time
+from collections import OrderedDict
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Authenticated user profiles, cached so get_current_user doesn't cost a Mongo
+# round trip on every request (a live camera calls /detect_frame several times
+# a second). Entries expire after USER_CACHE_TTL seconds and the least recently
+# used are dropped beyond USER_CACHE_SIZE. Handlers that change a profile call
+# invalidate(); other API workers see the change once their entry expires.
+
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "30"))
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "1000"))
+
+class UserCache:
+    # Only touched from the event loop, so no lock
+    def __init__(self, ttl=USER_CACHE_TTL, size=USER_CACHE_SIZE):
+        self.ttl = ttl
+        self.size = size
+        self._entries = OrderedDict() # username -> (expires, profile)
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, username):
+        entry = self._entries.get(username)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                del self._entries[username]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(username)
+        self.hits += 1
+        return dict(entry[1]) # Callers may modify their copy
+
+    def put(self, username, profile):
+        if self.ttl <= 0 or self.size <= 0:
+            return
+        self._entries[username] = (time.monotonic() + self.ttl, dict(profile))
+        self._entries.move_to_end(username)
+        while len(self._entries) > self.size:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, username):
+        self._entries.pop(username, None)
+
+    def metrics(self):
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses,
+                "ttl": self.ttl, "size": self.size}
+
+users = UserCache()
@@ -0,0 +1,225 @@
+import os
+import cv2
+import shutil
+import subprocess
+from collections import deque
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Where the annotated frames of a processed video go.
+#
+#   clips - (default) only short annotated clips around detection events, each
+#           with a keyframe thumbnail. Frames outside events are never drawn or
+#           encoded; the player shows the original upload with the detections
+#           sidecar overlaid instead.
+#   full  - re-encode the whole video with overlays (processed_<name>.mp4)
+#   hls   - the full annotated video as HLS: short .ts segments plus an event
+#           playlist (processed_<name>.m3u8), written by ffmpeg while the job
+#           runs, so playback can start after the first segment and seeking
+#           only fetches the segments it needs. Served from /hls. When the job
+#           ends the segments are also remuxed (no re-encode) into
+#           processed_<name>.mp4 for browsers without native HLS playback.
+#
+# The encode stage asks needs_annotation() before drawing a frame, then hands
+# every frame to write() in order. progress_info() is merged into the job's
+# progress records (the playlist URL once the first segment exists).
+
+VIDEO_OUTPUT = os.getenv("VIDEO_OUTPUT", "clips")
+CLIP_PRE_SECONDS = float(os.getenv("CLIP_PRE_SECONDS", "2")) # Kept before the first detection of an event
+CLIP_POST_SECONDS = float(os.getenv("CLIP_POST_SECONDS", "3")) # Kept after the last one; a detection within this gap extends the clip
+THUMBNAIL_WIDTH = int(os.getenv("THUMBNAIL_WIDTH", "480"))
+FFMPEG_BIN = os.getenv("FFMPEG_BIN", "ffmpeg")
+HLS_SEGMENT_SECONDS = float(os.getenv("HLS_SEGMENT_SECONDS", "4"))
+HLS_PRESET = os.getenv("HLS_PRESET", "veryfast") # libx264 speed/size trade-off
+
+def upload_url(path):
+    return f"/uploads/{os.path.basename(path)}"
+
+def hls_url(path):
+    return f"/hls/{os.path.basename(path)}"
+
+class FullVideoOutput:
+    def __init__(self, output_path, fps, size):
+        self.output_path = output_path
+        self.writer = cv2.VideoWriter(output_path, cv2.VideoWriter_fourcc(*'mp4v'), fps, size)
+
+    def needs_annotation(self, index, detections):
+        return True
+
+    def write(self, index, frame, annotated, detections):
+        self.writer.write(annotated)
+
+    def close(self):
+        self.writer.release()
+
+    def progress_info(self):
+        return {}
+
+    def summary(self):
+        return {"output_mode": "full", "video_url": upload_url(self.output_path), "clips": None}
+
+class HlsVideoOutput:
+    def __init__(self, output_path, fps, size):
+        base = os.path.splitext(output_path)[0]
+        self.playlist_path = base + ".m3u8"
+        self.mp4_path = base + ".mp4"
+        self.mp4_ready = False
+        fps = fps or 25
+        gop = max(1, int(round(fps * HLS_SEGMENT_SECONDS))) # A keyframe at every segment boundary
+        command = [
+            FFMPEG_BIN, "-hide_banner", "-loglevel", "error", "-y",
+            "-f", "rawvideo", "-pix_fmt", "bgr24", "-s", f"{size[0]}x{size[1]}", "-r", str(fps), "-i", "-",
+            "-vf", "scale=trunc(iw/2)*2:trunc(ih/2)*2", # yuv420p needs even dimensions
+            "-c:v", "libx264", "-preset", HLS_PRESET, "-pix_fmt", "yuv420p",
+            "-g", str(gop), "-keyint_min", str(gop), "-sc_threshold", "0",
+            "-f", "hls", "-hls_time", str(HLS_SEGMENT_SECONDS), "-hls_playlist_type", "event",
+            "-hls_flags", "independent_segments+temp_file",
+            "-hls_segment_filename", f"{base}_%05d.ts",
+            self.playlist_path,
+        ]
+        self.process = subprocess.Popen(command, stdin=subprocess.PIPE, stderr=subprocess.PIPE)
+
+    def needs_annotation(self, index, detections):
+        return True
+
+    def write(self, index, frame, annotated, detections):
+        try:
+            self.process.stdin.write(annotated.tobytes())
+        except BrokenPipeError:
+            raise RuntimeError(f"ffmpeg exited early: {self._errors()}")
+
+    def _errors(self):
+        self.process.wait()
+        return self.process.stderr.read().decode(errors="replace").strip() or f"exit code {self.process.returncode}"
+
+    def close(self):
+        # Closing stdin lets ffmpeg write the last segment and end the playlist
+        try:
+            self.process.stdin.close()
+        except BrokenPipeError:
+            pass
+        if self.process.wait() != 0:
+            raise RuntimeError(f"ffmpeg failed: {self._errors()}")
+        remux = subprocess.run([
+            FFMPEG_BIN, "-hide_banner", "-loglevel", "error", "-y", "-i", self.playlist_path,
+            "-c", "copy", "-movflags", "+faststart", self.mp4_path,
+        ], stderr=subprocess.PIPE)
+        if remux.returncode == 0:
+            self.mp4_ready = True
+        else:
+            print(f"Warning: Could not remux {self.playlist_path} to mp4: {remux.stderr.decode(errors='replace').strip()}", flush=True)
+
+    def progress_info(self):
+        return {"playlist_url": hls_url(self.playlist_path)} if os.path.exists(self.playlist_path) else {}
+
+    def summary(self):
+        return {"output_mode": "hls", "video_url": hls_url(self.playlist_path), "clips": None,
+                "video_file_url": upload_url(self.mp4_path) if self.mp4_ready else None}
+
+class ClipOutput:
+    def __init__(self, output_path, source_path, fps, size, pre_seconds=CLIP_PRE_SECONDS, post_seconds=CLIP_POST_SECONDS):
+        # Clips are named processed_<name>_clipNN.mp4 (+ .jpg thumbnail) next to output_path
+        self.base = os.path.splitext(output_path)[0]
+        self.source_path = source_path
+        self.fps = fps or 25
+        self.size = size
+        self.pre_frames = int(round(pre_seconds * self.fps))
+        self.post_frames = int(round(post_seconds * self.fps))
+        self.pending = deque(maxlen=self.pre_frames or 1) # (index, raw frame) waiting to become pre-padding
+        self.writer = None
+        self.clip = None
+        self.clips = []
+
+    def needs_annotation(self, index, detections):
+        return bool(detections) or (self.writer is not None and index - self.clip["last_event"] <= self.post_frames)
+
+    def write(self, index, frame, annotated, detections):
+        if detections:
+            if self.writer is None:
+                self._open(index)
+            self.writer.write(annotated)
+            self.clip["last_event"] = index
+            self.clip["end_frame"] = index
+            self.clip["classes"].update(det["label"] for det in detections)
+            peak = max(det["confidence"] for det in detections)
+            if peak > self.clip["peak_confidence"]:
+                self.clip["peak_confidence"] = peak
+                self.clip["peak_frame"] = index
+                self._thumbnail(annotated)
+        elif self.writer is not None and index - self.clip["last_event"] <= self.post_frames:
+            self.writer.write(annotated if annotated is not None else frame)
+            self.clip["end_frame"] = index
+        else:
+            if self.writer is not None:
+                self._close_clip()
+            if self.pre_frames:
+                self.pending.append((index, frame))
+
+    def _open(self, index):
+        number = len(self.clips) + 1
+        path = f"{self.base}_clip{number:02d}.mp4"
+        self.writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'mp4v'), self.fps, self.size)
+        start = self.pending[0][0] if self.pending else index
+        for _, raw in self.pending:
+            self.writer.write(raw)
+        self.pending.clear()
+        self.clip = {
+            "clip": number,
+            "path": path,
+            "thumbnail_path": f"{self.base}_clip{number:02d}.jpg",
+            "start_frame": start,
+            "end_frame": index,
+            "last_event": index,
+            "peak_frame": index,
+            "peak_confidence": 0.0,
+            "classes": set(),
+        }
+
+    def _thumbnail(self, annotated):
+        height, width = annotated.shape[:2]
+        if width > THUMBNAIL_WIDTH:
+            annotated = cv2.resize(annotated, (THUMBNAIL_WIDTH, int(height * THUMBNAIL_WIDTH / width)), interpolation=cv2.INTER_AREA)
+        cv2.imwrite(self.clip["thumbnail_path"], annotated)
+
+    def _close_clip(self):
+        self.writer.release()
+        self.writer = None
+        clip = self.clip
+        self.clips.append({
+            "clip": clip["clip"],
+            "url": upload_url(clip["path"]),
+            "thumbnail_url": upload_url(clip["thumbnail_path"]),
+            "start_frame": clip["start_frame"],
+            "end_frame": clip["end_frame"],
+            "start_time": round(clip["start_frame"] / self.fps, 3),
+            "end_time": round((clip["end_frame"] + 1) / self.fps, 3),
+            "peak_time": round(clip["peak_frame"] / self.fps, 3),
+            "peak_confidence": round(clip["peak_confidence"], 4),
+            "classes": sorted(clip["classes"]),
+        })
+        self.clip = None
+
+    def close(self):
+        if self.writer is not None:
+            self._close_clip()
+        self.pending.clear()
+
+    def progress_info(self):
+        return {}
+
+    def summary(self):
+        # The original upload is what plays; the clips are the annotated evidence
+        return {"output_mode": "clips", "video_url": upload_url(self.source_path), "clips": self.clips}
+
+def open_video_output(mode, output_path, source_path, fps, size):
+    if mode == "full":
+        return FullVideoOutput(output_path, fps, size)
+    if mode == "clips":
+        return ClipOutput(output_path, source_path, fps, size)
+    if mode == "hls":
+        if shutil.which(FFMPEG_BIN):
+            return HlsVideoOutput(output_path, fps, size)
+        print(f"Warning: '{FFMPEG_BIN}' not found, writing a single video file instead of HLS", flush=True)
+        return FullVideoOutput(output_path, fps, size)
+    raise ValueError(f"Unknown VIDEO_OUTPUT '{mode}' (expected 'clips', 'full' or 'hls')")
@@ -0,0 +1,100 @@
+import queue
+import threading
+import time
+
+# Staged video pipeline: a decode thread, an inference stage on the calling
+# thread and an annotate+encode thread, joined by bounded FIFO queues so
+# output order matches input order.
+
+_DONE = object()
+
+def run_pipeline(produce, transform, consume, queue_size=4):
+    """
+    produce()       -> iterable of items, runs on the decode thread
+    transform(item) -> item for the encoder, runs on the calling thread
+    consume(item)   -> None, runs on the encode thread
+
+    Returns the seconds each stage spent working (queue waits excluded)
+    plus the total wall time.
+    """
+    decode_q = queue.Queue(maxsize=queue_size)
+    encode_q = queue.Queue(maxsize=queue_size)
+    stop = threading.Event()
+    errors = []
+    timings = {"decode": 0.0, "infer": 0.0, "encode": 0.0}
+
+    def put(q, item):
+        while not stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def get(q):
+        while not stop.is_set():
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return _DONE
+
+    def decode_worker():
+        try:
+            items = iter(produce())
+            while True:
+                start = time.perf_counter()
+                item = next(items, _DONE)
+                timings["decode"] += time.perf_counter() - start
+                if item is _DONE or not put(decode_q, item):
+                    break
+        except Exception as e:
+            errors.append(e)
+            stop.set()
+        finally:
+            put(decode_q, _DONE)
+
+    def encode_worker():
+        try:
+            while True:
+                item = get(encode_q)
+                if item is _DONE:
+                    break
+                start = time.perf_counter()
+                consume(item)
+                timings["encode"] += time.perf_counter() - start
+        except Exception as e:
+            errors.append(e)
+            stop.set()
+
+    wall_start = time.perf_counter()
+    decoder = threading.Thread(target=decode_worker, name="video-decode", daemon=True)
+    encoder = threading.Thread(target=encode_worker, name="video-encode", daemon=True)
+    decoder.start()
+    encoder.start()
+
+    try:
+        while True:
+            item = get(decode_q)
+            if item is _DONE:
+                break
+            start = time.perf_counter()
+            item = transform(item)
+            timings["infer"] += time.perf_counter() - start
+            if not put(encode_q, item):
+                break
+        put(encode_q, _DONE)
+    except BaseException:
+        # Including Ctrl+C, so the other stages stop instead of waiting on full queues
+        stop.set()
+        raise
+    finally:
+        decoder.join()
+        encoder.join()
+
+    if errors:
+        raise errors[0]
+
+    timings["total"] = time.perf_counter() - wall_start
+    return {stage: round(seconds, 3) for stage, seconds in timings.items()}
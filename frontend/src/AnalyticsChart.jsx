@@ -1,3 +1,4 @@
+import { useState, useEffect, useCallback } from 'react';
 import {
     Chart as ChartJS,
     CategoryScale,
@@ -45,11 +46,52 @@ export const options = {
     }
 };
 
+// Counts come from the server's hourly rollups (GET /analytics), so they cover
+// every upload and live frame, not just this session. The server flushes new
+// counts every few seconds, so refetch shortly after the history changes.
+const REFRESH_MS = 30000;
+const AFTER_SCAN_MS = 6000;
+
 const AnalyticsChart = ({ history }) => {
+    const [totals, setTotals] = useState(null);
+
+    const fetchTotals = useCallback(async () => {
+        try {
+            const token = localStorage.getItem('token');
+            const res = await fetch('/analytics?granularity=hour', {
+                headers: { 'Authorization': `Bearer ${token}` }
+            });
+            if (!res.ok) throw new Error(`Status ${res.status}`);
+            const data = await res.json();
+            setTotals(data.totals);
+        } catch (err) {
+            console.error("Analytics error:", err);
+        }
+    }, []);
 
-    const poacherCount = history.filter(h => parseFloat(h.poacher) > 0).length;
-    const weaponCount = history.filter(h => parseFloat(h.weapon) > 0).length;
-    const safeCount = history.filter(h => parseFloat(h.poacher) === 0 && parseFloat(h.weapon) === 0).length;
+    useEffect(() => {
+        fetchTotals();
+        const interval = setInterval(fetchTotals, REFRESH_MS);
+        return () => clearInterval(interval);
+    }, [fetchTotals]);
+
+    useEffect(() => {
+        if (history.length === 0) return;
+        const timeout = setTimeout(fetchTotals, AFTER_SCAN_MS);
+        return () => clearTimeout(timeout);
+    }, [history.length, fetchTotals]);
+
+    let poacherCount, weaponCount, safeCount;
+    if (totals) {
+        poacherCount = totals.poacher_scans || 0;
+        weaponCount = totals.weapon_scans || 0;
+        safeCount = totals.scans - totals.threat_scans;
+    } else {
+        // Until the first response arrives, show this session's history
+        poacherCount = history.filter(h => parseFloat(h.poacher) > 0).length;
+        weaponCount = history.filter(h => parseFloat(h.weapon) > 0).length;
+        safeCount = history.filter(h => parseFloat(h.poacher) === 0 && parseFloat(h.weapon) === 0).length;
+    }
 
     const data = {
         labels: ['Poachers', 'Weapons', 'Safe Scans'],
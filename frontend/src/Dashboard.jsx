@@ -2,11 +2,14 @@ import { useState, useRef, useEffect } from 'react'
 import './index.css'
 import MapComponent from './MapComponent';
 import AnalyticsChart from './AnalyticsChart';
+import EventPlayer from './EventPlayer';
+import HlsVideo from './HlsVideo';
 
 function Dashboard() {
   const [file, setFile] = useState(null)
   const [uploading, setUploading] = useState(false)
   const [processedVideo, setProcessedVideo] = useState(null)
+  const [processedResult, setProcessedResult] = useState(null) // Last finished upload (event clips, sidecar)
   const [stats, setStats] = useState({ poacher: '0%', weapon: '0%', mailSent: 'No', timestamp: '-' })
   const [history, setHistory] = useState([])
 
@@ -91,6 +94,165 @@ function Dashboard() {
     setHistory(prev => [{ ...newStats, type, id: Date.now() }, ...prev].slice(0, 10)); // Keep last 10
   };
 
+  const applyResult = (resultData) => {
+    setUploading(false)
+    setProcessedVideo(resultData.video_url)
+    setProcessedResult(resultData)
+
+    const newStats = {
+      poacher: `${resultData.poacher_confidence}%`,
+      weapon: `${resultData.weapon_confidence}%`,
+      mailSent: resultData.mail_sent,
+      timestamp: resultData.timestamp || new Date().toLocaleString()
+    };
+
+    setStats(newStats)
+    addToHistory(newStats, 'File Upload');
+
+    // Trigger Alert Sound & Map Update
+    if (parseFloat(newStats.poacher) > 0 || parseFloat(newStats.weapon) > 0) {
+      playSiren();
+      setActiveThreats(prev => [...prev, {
+        position: generateRandomLocation(),
+        type: parseFloat(newStats.poacher) > 0 ? 'Poacher' : 'Weapon',
+        confidence: parseFloat(newStats.poacher) > 0 ? newStats.poacher : newStats.weapon
+      }]);
+
+      if (whatsappConnected) {
+        console.log("📲 Sending WhatsApp alert to Ranger Group...");
+        showNotification("📲 WhatsApp Alert Sent to Rangers!", "success");
+        // In a real app, this would call a backend endpoint
+      }
+    }
+  }
+
+  const applyError = (message) => {
+    setUploading(false)
+    alert(`Analysis failed: ${message}`)
+  }
+
+  // Fallback: poll for results
+  const pollResults = (filename) => {
+    const pollInterval = setInterval(async () => {
+      try {
+        const res = await fetch(`/results/${filename}?t=${Date.now()}`)
+        const resultData = await res.json()
+
+        if (resultData.status === 'completed') {
+          clearInterval(pollInterval)
+          applyResult(resultData)
+        } else if (resultData.status === 'error') {
+          clearInterval(pollInterval)
+          applyError(resultData.message)
+        }
+      } catch (err) {
+        console.error("Polling error:", err)
+      }
+    }, 2000)
+  }
+
+  // Server-sent job events: state transitions and progress as they happen.
+  // EventSource reconnects on its own and resumes from the last event id.
+  const watchJobEvents = (jobId, filename, token) => {
+    const source = new EventSource(`/jobs/${jobId}/events?token=${encodeURIComponent(token)}`)
+    let finished = false
+
+    source.addEventListener('state', (e) => {
+      const job = JSON.parse(e.data)
+      if (job.state === 'queued') {
+        setStats(prev => ({ ...prev, timestamp: `Queued (#${job.queue_position})` }))
+      } else if (job.state === 'done' || job.state === 'failed') {
+        finished = true
+        source.close()
+        const result = job.result || {}
+        if (result.status === 'completed') {
+          applyResult(result)
+        } else {
+          applyError(result.message || job.error || 'Unknown error')
+        }
+      }
+    })
+
+    source.addEventListener('progress', (e) => {
+      const progress = JSON.parse(e.data)
+      const percent = progress.frames_total ? Math.round(100 * progress.frames_done / progress.frames_total) : null
+      const eta = progress.eta_seconds != null ? ` · ETA ${Math.ceil(progress.eta_seconds)}s` : ''
+      setStats(prev => ({ ...prev, timestamp: `Processing ${percent != null ? percent + '%' : progress.frames_done + ' frames'}${eta}` }))
+      // Segmented output: start playing what has been processed so far
+      if (progress.playlist_url) setProcessedVideo(progress.playlist_url)
+    })
+
+    source.onerror = () => {
+      // Job unknown to this server (e.g. restart) or events unsupported: fall back to polling
+      if (!finished && source.readyState === EventSource.CLOSED) {
+        pollResults(filename)
+      }
+    }
+  }
+
+  // Large files go through resumable upload sessions: the bytes are PUT in
+  // chunks, and a dropped connection (or a page reload) resumes from the
+  // server's offset instead of starting over.
+  const RESUMABLE_THRESHOLD = 32 * 1024 * 1024
+
+  const uploadResumable = async (fileToUpload, token) => {
+    const headers = { 'Authorization': `Bearer ${token}` }
+    const sessionKey = `upload:${fileToUpload.name}:${fileToUpload.size}:${fileToUpload.lastModified}`
+
+    let session = null
+    const savedId = localStorage.getItem(sessionKey)
+    if (savedId) {
+      const res = await fetch(`/upload/sessions/${savedId}`, { headers })
+      if (res.ok) session = await res.json()
+    }
+    if (!session) {
+      const res = await fetch('/upload/sessions', {
+        method: 'POST',
+        headers: { ...headers, 'Content-Type': 'application/json' },
+        body: JSON.stringify({ filename: fileToUpload.name, size: fileToUpload.size }),
+      })
+      if (!res.ok) {
+        const errorData = await res.json()
+        throw new Error(errorData.detail || 'Upload failed')
+      }
+      session = await res.json()
+      localStorage.setItem(sessionKey, session.upload_id)
+    }
+
+    let offset = session.offset
+    let failures = 0
+    while (offset < fileToUpload.size) {
+      setStats(prev => ({ ...prev, timestamp: `Uploading ${Math.floor(100 * offset / fileToUpload.size)}%` }))
+      try {
+        const res = await fetch(`/upload/sessions/${session.upload_id}?offset=${offset}`, {
+          method: 'PUT',
+          headers: { ...headers, 'Content-Type': 'application/octet-stream' },
+          body: fileToUpload.slice(offset, offset + session.chunk_size),
+        })
+        if (res.ok) {
+          offset = (await res.json()).offset
+          failures = 0
+          continue
+        }
+        if (res.status !== 409) {
+          const errorData = await res.json()
+          throw new Error(errorData.detail || 'Upload failed')
+        }
+      } catch (err) {
+        if (!(err instanceof TypeError) || ++failures > 5) throw err // TypeError: network failure
+        await new Promise(resolve => setTimeout(resolve, 1000 * 2 ** failures))
+      }
+      // Out of step or interrupted: ask the server how much it has
+      const res = await fetch(`/upload/sessions/${session.upload_id}`, { headers })
+      if (!res.ok) throw new Error('Upload session lost')
+      offset = (await res.json()).offset
+    }
+
+    const response = await fetch(`/upload/sessions/${session.upload_id}/finalize`, { method: 'POST', headers })
+    if (response.ok) localStorage.removeItem(sessionKey)
+    return response
+  }
+
   const handleUpload = async (selectedFile = null) => {
     const fileToUpload = selectedFile || file;
     if (!fileToUpload) return
@@ -104,13 +266,15 @@ function Dashboard() {
 
     try {
       const token = localStorage.getItem('token');
-      const response = await fetch('/upload', {
-        method: 'POST',
-        headers: {
-          'Authorization': `Bearer ${token}`
-        },
-        body: formData,
-      })
+      const response = fileToUpload.size > RESUMABLE_THRESHOLD
+        ? await uploadResumable(fileToUpload, token)
+        : await fetch('/upload', {
+          method: 'POST',
+          headers: {
+            'Authorization': `Bearer ${token}`
+          },
+          body: formData,
+        })
 
       if (!response.ok) {
         const errorData = await response.json();
@@ -120,53 +284,20 @@ function Dashboard() {
       const data = await response.json()
       console.log("Upload success:", data)
 
-      // Start polling for results
-      const filename = fileToUpload.name
-      const pollInterval = setInterval(async () => {
-        try {
-          const res = await fetch(`/results/${filename}?t=${Date.now()}`)
-          const resultData = await res.json()
-
-          if (resultData.status === 'completed') {
-            clearInterval(pollInterval)
-            setUploading(false)
-            setProcessedVideo(resultData.video_url)
-
-            const newStats = {
-              poacher: `${resultData.poacher_confidence}%`,
-              weapon: `${resultData.weapon_confidence}%`,
-              mailSent: resultData.mail_sent,
-              timestamp: resultData.timestamp || new Date().toLocaleString()
-            };
-
-            setStats(newStats)
-            addToHistory(newStats, 'File Upload');
-
-            // Trigger Alert Sound & Map Update
-            if (parseFloat(newStats.poacher) > 0 || parseFloat(newStats.weapon) > 0) {
-              playSiren();
-              setActiveThreats(prev => [...prev, {
-                position: generateRandomLocation(),
-                type: parseFloat(newStats.poacher) > 0 ? 'Poacher' : 'Weapon',
-                confidence: parseFloat(newStats.poacher) > 0 ? newStats.poacher : newStats.weapon
-              }]);
-
-              if (whatsappConnected) {
-                console.log("📲 Sending WhatsApp alert to Ranger Group...");
-                showNotification("📲 WhatsApp Alert Sent to Rangers!", "success");
-                // In a real app, this would call a backend endpoint
-              }
-            }
-
-          } else if (resultData.status === 'error') {
-            clearInterval(pollInterval)
-            setUploading(false)
-            alert(`Analysis failed: ${resultData.message}`)
-          }
-        } catch (err) {
-          console.error("Polling error:", err)
-        }
-      }, 2000)
+      // Same bytes already analysed with the current model: nothing to wait for
+      if (data.cached) {
+        applyResult(data.result)
+        return
+      }
+
+      // Prefer server-pushed job events; fall back to polling /results.
+      // The server stores uploads by content hash, so use the name it returned.
+      const filename = data.filename
+      if (data.job_id && window.EventSource) {
+        watchJobEvents(data.job_id, filename, token)
+      } else {
+        pollResults(filename)
+      }
 
     } catch (error) {
       console.error('Error uploading file:', error)
@@ -209,6 +340,21 @@ function Dashboard() {
     }
   }, [videoStream]);
 
+  // Box colours for client-side drawing (same as the server's cv2 overlay)
+  const BOX_COLORS = { 0: '#ff0000', 1: '#00ff00', 2: '#ff0000', 3: '#ffa500' };
+
+  const drawDetections = (ctx, detections) => {
+    ctx.lineWidth = 2;
+    ctx.font = '16px sans-serif';
+    detections.forEach(({ box: [x1, y1, x2, y2], class_id, label, confidence }) => {
+      const color = BOX_COLORS[class_id] || '#ffffff';
+      ctx.strokeStyle = color;
+      ctx.fillStyle = color;
+      ctx.strokeRect(x1, y1, x2 - x1, y2 - y1);
+      ctx.fillText(`${label} ${Math.round(confidence * 100)}%`, x1, y1 - 10);
+    });
+  };
+
   // Manual Capture Logic (HTTP)
   const captureFrame = async () => {
     if (!videoRef.current || !cameraActive || mode !== 'camera') return;
@@ -230,7 +376,9 @@ function Dashboard() {
 
       try {
         const token = localStorage.getItem('token');
-        const res = await fetch('/detect_frame', {
+        // Detections only: we already have the frame, so draw the boxes here
+        // instead of downloading a re-encoded copy
+        const res = await fetch('/detect_frame?mode=detections', {
           method: 'POST',
           headers: {
             'Authorization': `Bearer ${token}`
@@ -244,6 +392,9 @@ function Dashboard() {
 
         if (data.image) {
           setProcessedVideo(data.image);
+        } else if (data.detections) {
+          drawDetections(offCtx, data.detections);
+          setProcessedVideo(offscreen.toDataURL('image/jpeg'));
         }
 
         const newStats = {
@@ -456,7 +607,11 @@ function Dashboard() {
             )}
 
             {processedVideo ? (
-              processedVideo.endsWith('.mp4') ? (
+              processedResult && processedResult.output_mode === 'clips' && processedVideo === processedResult.video_url ? (
+                <EventPlayer result={processedResult} drawDetections={drawDetections} />
+              ) : processedVideo.endsWith('.m3u8') ? (
+                <HlsVideo src={processedVideo} fallbackSrc={processedResult && processedResult.video_file_url} className="main-video" />
+              ) : processedVideo.endsWith('.mp4') ? (
                 <video src={processedVideo} controls autoPlay loop className="main-video" />
               ) : (
                 <img src={processedVideo} alt="Processed" className="main-video" />
@@ -480,7 +635,7 @@ function Dashboard() {
               </div>
               <div className="stat-box">
                 <span className="label">EMAIL ALERT</span>
-                <span className={`value ${stats.mailSent === 'Yes' ? 'success' : ''}`}>{stats.mailSent}</span>
+                <span className={`value ${['Yes', 'Queued'].includes(stats.mailSent) ? 'success' : ''}`}>{stats.mailSent}</span>
               </div>
               <div className="stat-box time-box">
                 <span className="label">LAST UPDATE</span>
@@ -0,0 +1,112 @@
+import { useState, useRef, useEffect } from 'react'
+
+const SIDECAR_PAGE = 5000 // Frames per /results page (the server's maximum)
+
+// Plays the original upload with the detections sidecar drawn on top, plus a
+// strip of event clips (keyframe thumbnails) that seek to each event. If the
+// browser can't play the upload's format (e.g. .avi/.mkv), it plays the
+// annotated event clips instead.
+function EventPlayer({ result, drawDetections }) {
+  const videoRef = useRef(null)
+  const canvasRef = useRef(null)
+  const [frames, setFrames] = useState(new Map()) // frame index -> detections
+  const [activeClip, setActiveClip] = useState(null) // Set when playing a clip instead of the upload
+  const hasClips = result.clips && result.clips.length > 0
+  const filename = result.video_url.split('/').pop()
+
+  // Page through the sidecar via /results; only frames with boxes are kept, and
+  // the overlay starts drawing as soon as the first page arrives
+  useEffect(() => {
+    if (!result.detections_sidecar) return
+    let cancelled = false
+    const withBoxes = new Map()
+    const loadPages = async () => {
+      let cursor = 0
+      while (!cancelled) {
+        const res = await fetch(`/results/${encodeURIComponent(filename)}?cursor=${cursor}&limit=${SIDECAR_PAGE}`)
+        if (!res.ok) throw new Error(`Status ${res.status}`)
+        const page = (await res.json()).frames
+        page.frames.forEach(record => {
+          if (record.detections.length) withBoxes.set(record.frame, record.detections)
+        })
+        if (!cancelled) setFrames(new Map(withBoxes))
+        if (page.eof || page.next_cursor === cursor) return
+        cursor = page.next_cursor
+      }
+    }
+    loadPages().catch(err => console.error('Could not load detections sidecar:', err))
+    return () => { cancelled = true }
+  }, [result.detections_sidecar, filename])
+
+  // Redraw the overlay for whichever frame is on screen
+  useEffect(() => {
+    let handle
+    const draw = () => {
+      const video = videoRef.current
+      const canvas = canvasRef.current
+      if (video && canvas && video.videoWidth) {
+        if (canvas.width !== video.videoWidth) {
+          canvas.width = video.videoWidth
+          canvas.height = video.videoHeight
+        }
+        const ctx = canvas.getContext('2d')
+        ctx.clearRect(0, 0, canvas.width, canvas.height)
+        // Clips already have the boxes burned in
+        const detections = activeClip ? null : frames.get(Math.floor(video.currentTime * (result.fps || 25)))
+        if (detections) drawDetections(ctx, detections)
+      }
+      handle = requestAnimationFrame(draw)
+    }
+    handle = requestAnimationFrame(draw)
+    return () => cancelAnimationFrame(handle)
+  }, [frames, result.fps, drawDetections, activeClip])
+
+  const seekTo = (clip) => {
+    if (activeClip) {
+      setActiveClip(clip)
+      return
+    }
+    const video = videoRef.current
+    if (!video) return
+    video.currentTime = clip.start_time
+    video.play()
+  }
+
+  const onSourceError = () => {
+    // Upload format the browser can't decode: fall back to the annotated clips
+    if (!activeClip && hasClips) setActiveClip(result.clips[0])
+  }
+
+  return (
+    <div style={{ display: 'flex', flexDirection: 'column', alignItems: 'center', gap: '10px', maxWidth: '100%', maxHeight: '100%' }}>
+      <div style={{ position: 'relative' }}>
+        <video ref={videoRef} src={activeClip ? activeClip.url : result.video_url} onError={onSourceError}
+          controls autoPlay loop className="main-video" />
+        <canvas ref={canvasRef} style={{ position: 'absolute', inset: 0, width: '100%', height: '100%', pointerEvents: 'none', zIndex: 11 }} />
+      </div>
+      {activeClip && (
+        <div style={{ fontSize: '12px', zIndex: 10 }}>This browser can't play the original upload; showing event clips.</div>
+      )}
+      {hasClips && (
+        <div style={{ display: 'flex', gap: '8px', overflowX: 'auto', maxWidth: '100%', zIndex: 10 }}>
+          {result.clips.map(clip => (
+            <div key={clip.clip} style={{ textAlign: 'center', fontSize: '12px' }}>
+              <img
+                src={clip.thumbnail_url}
+                alt={`Event ${clip.clip}`}
+                title={`${clip.classes.join(', ')} · ${Math.round(clip.peak_confidence * 100)}%`}
+                onClick={() => seekTo(clip)}
+                style={{ width: '120px', cursor: 'pointer', borderRadius: '4px' }}
+              />
+              <div>
+                {clip.start_time.toFixed(1)}s–{clip.end_time.toFixed(1)}s · <a href={clip.url} download>clip</a>
+              </div>
+            </div>
+          ))}
+        </div>
+      )}
+    </div>
+  )
+}
+
+export default EventPlayer
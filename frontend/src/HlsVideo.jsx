@@ -0,0 +1,33 @@
+import { useRef, useEffect, useState } from 'react'
+
+// HLS playback for segmented job output. The playlist keeps growing while the
+// job runs; browsers with native HLS (Safari, iOS, Android) reload it until the
+// server ends it. Elsewhere the MP4 remuxed from the segments plays once the
+// job has finished (fallbackSrc).
+function HlsVideo({ src, fallbackSrc, className }) {
+  const videoRef = useRef(null)
+  const [native, setNative] = useState(true)
+
+  useEffect(() => {
+    const video = videoRef.current
+    if (!video) return
+    const canPlay = video.canPlayType('application/vnd.apple.mpegurl') !== ''
+    setNative(canPlay)
+    if (canPlay) {
+      video.src = src
+    } else if (fallbackSrc) {
+      video.src = fallbackSrc
+    }
+  }, [src, fallbackSrc])
+
+  return (
+    <>
+      <video ref={videoRef} controls autoPlay muted className={className} />
+      {!native && !fallbackSrc && (
+        <div style={{ fontSize: '12px', zIndex: 10 }}>This browser can't play the live stream; the video appears here when the job finishes.</div>
+      )}
+    </>
+  )
+}
+
+export default HlsVideo
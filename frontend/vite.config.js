@@ -13,7 +13,11 @@ export default defineConfig({
       '/auth': 'http://localhost:8000',
       '/login/google': 'http://localhost:8000',
       '/login/github': 'http://localhost:8000',
-      '/users': 'http://localhost:8000'
+      '/users': 'http://localhost:8000',
+      '/jobs': 'http://localhost:8000',
+      '/analytics': 'http://localhost:8000',
+      '/detections': 'http://localhost:8000',
+      '/hls': 'http://localhost:8000'
     }
   }
 })